@@ -0,0 +1,213 @@
+"""
+Load, check and export many client ledgers in a process pool.
+
+    PYTHONPATH=. uv run python batch_ledgers.py "klienter/*" -j 8 --report rapport.json
+
+Each argument is a ledger file, a folder holding regnskab.beancount, or a
+glob of either. Every ledger is loaded in a worker process with the Danish
+plugin stats switched on, so the report has the load time, the plugin
+timings and the errors of each ledger. The export goes next to the ledger
+(regnskab_genereret.<format>) unless --output-dir is given; there each
+export is named after the client folder and, unless it is regnskab.beancount,
+the ledger file.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+from beancount import loader
+from beancount.parser import printer
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+import export_ledger  # noqa: E402
+from plugins import instrumentation  # noqa: E402
+
+LEDGER_NAME = "regnskab.beancount"
+MAX_REPORTED_ERRORS = 20
+
+
+def find_ledgers(patterns):
+    """Absolute ledger file names for files, folders and globs, in order."""
+    ledgers = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        for path in matches or [pattern]:
+            if os.path.isdir(path):
+                path = os.path.join(path, LEDGER_NAME)
+            # A glob may also match files and folders that are not ledgers.
+            if matches and not (path.endswith(".beancount") and os.path.isfile(path)):
+                continue
+            path = os.path.abspath(path)
+            if path not in ledgers:
+                ledgers.append(path)
+    return ledgers
+
+
+def output_name(ledger):
+    """The client folder, plus the file name unless it is regnskab.beancount."""
+    folder = os.path.basename(os.path.dirname(ledger))
+    stem, _ = os.path.splitext(os.path.basename(ledger))
+    return folder if os.path.basename(ledger) == LEDGER_NAME else f"{folder}-{stem}"
+
+
+def output_paths(ledgers, output_dir, output_format):
+    """{ledger: export file}, with a unique file name per ledger in output_dir."""
+    paths = {}
+    if output_dir is None:
+        for ledger in ledgers:
+            folder = os.path.dirname(ledger)
+            paths[ledger] = os.path.join(folder, f"regnskab_genereret.{output_format}")
+        return paths
+    # Workers chdir to their ledger, so the folder must be absolute.
+    output_dir = os.path.abspath(output_dir)
+    used = set()
+    for ledger in ledgers:
+        name = base = output_name(ledger)
+        number = 1
+        while name in used:
+            number += 1
+            name = f"{base}-{number}"
+        used.add(name)
+        paths[ledger] = os.path.join(output_dir, f"{name}.{output_format}")
+    return paths
+
+
+def run_ledger(ledger, output_file, output_format="beancount", use_cache=True):
+    """Load, check and export one ledger. Runs in a worker process."""
+    result = {
+        "ledger": ledger,
+        "output": output_file,
+        "ok": False,
+        "entries": 0,
+        "errors": [],
+        "error_count": 0,
+        "load_s": None,
+        "export_s": None,
+        "plugins": None,
+        "exception": None,
+    }
+    os.environ[instrumentation.ENV_VAR] = "1"
+    loader.initialize(use_cache=use_cache)
+    instrumentation.current = None
+    captured = io.StringIO()
+    try:
+        if not os.path.isfile(ledger):
+            raise FileNotFoundError(f"no ledger at {ledger}")
+        # Plugin paths such as bilag/salg are relative to the ledger.
+        os.chdir(os.path.dirname(ledger))
+        with contextlib.redirect_stdout(captured), contextlib.redirect_stderr(captured):
+            t0 = time.perf_counter()
+            entries, errors, options = loader.load_file(ledger)
+            result["load_s"] = round(time.perf_counter() - t0, 6)
+            if instrumentation.current is not None:
+                result["plugins"] = instrumentation.current.records
+            t0 = time.perf_counter()
+            export_ledger.export_entries(
+                entries, options, output_file, output_format=output_format
+            )
+            result["export_s"] = round(time.perf_counter() - t0, 6)
+    except Exception as exc:
+        result["exception"] = f"{type(exc).__name__}: {exc}"
+        return result
+    result["entries"] = len(entries)
+    result["error_count"] = len(errors)
+    result["errors"] = [
+        printer.format_error(error).strip() for error in errors[:MAX_REPORTED_ERRORS]
+    ]
+    result["ok"] = not errors
+    return result
+
+
+def run_batch(
+    ledgers, jobs=None, output_dir=None, output_format="beancount", use_cache=True
+):
+    """Run every ledger in a process pool and yield results as they finish."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    paths = output_paths(ledgers, output_dir, output_format)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                run_ledger,
+                ledger,
+                paths[ledger],
+                output_format,
+                use_cache,
+            )
+            for ledger in ledgers
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summary_line(result):
+    if result["exception"]:
+        status = "FAILED"
+    elif result["ok"]:
+        status = "ok"
+    else:
+        status = f"{result['error_count']} errors"
+    load_s = result["load_s"] if result["load_s"] is not None else 0
+    return f"  {status:<12} {load_s:>8.2f}s {result['entries']:>8}  {result['ledger']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and export many ledgers.")
+    parser.add_argument("ledgers", nargs="+", help="ledger files, folders or globs")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes")
+    parser.add_argument("--output-dir")
+    parser.add_argument(
+        "--format",
+        choices=["beancount", *export_ledger.ANALYTICS_WRITERS],
+        default="beancount",
+    )
+    parser.add_argument("--report", help="write the full report as JSON")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="bypass beancount's pickle cache"
+    )
+    args = parser.parse_args()
+
+    ledgers = find_ledgers(args.ledgers)
+    print(f"Running {len(ledgers)} ledgers...")
+    t0 = time.perf_counter()
+    results = []
+    for result in run_batch(
+        ledgers, args.jobs, args.output_dir, args.format, not args.no_cache
+    ):
+        print(summary_line(result), flush=True)
+        for message in result["errors"][:3]:
+            print(f"      {message.splitlines()[0]}")
+        if result["exception"]:
+            print(f"      {result['exception']}")
+        results.append(result)
+    wall_s = time.perf_counter() - t0
+
+    results.sort(key=lambda result: ledgers.index(result["ledger"]))
+    failed = [result for result in results if not result["ok"]]
+    print(
+        f"{len(results) - len(failed)} of {len(results)} ledgers ok "
+        f"in {wall_s:.2f}s (sum of loads {sum(r['load_s'] or 0 for r in results):.2f}s)."
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(
+                {"wall_s": round(wall_s, 6), "ledgers": results},
+                f,
+                indent=1,
+                ensure_ascii=False,
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
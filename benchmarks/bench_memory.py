@@ -0,0 +1,150 @@
+"""
+Memory used by the Danish plugins on a parsed synthetic ledger.
+
+Usage: python benchmarks/bench_memory.py [--years N] [--entries M]
+                                          [--no-builder-cache | --compare]
+
+The ledger is generated and loaded without the Danish plugins first, so the
+figures only cover the run of the four plugins of __plugins__:
+
+- peak: peak traced Python memory while the plugins run
+- retained: memory still held by the output after the run, and the number
+  of live allocations per entry
+- max RSS: peak resident size of the whole process, including the parse
+
+--no-builder-cache builds every posting, amount and link afresh, as the
+plugins did before plugins.builder shared them. --compare runs both modes,
+each in a fresh process so max RSS is its own, and prints the change.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from beancount import loader
+
+# Ensure we can import the plugins
+sys.path.insert(0, os.getcwd())
+
+from benchmarks.generate_ledger import generate_ledger  # noqa: E402
+from benchmarks.run_benchmarks import raw_entries  # noqa: E402
+from plugins import builder  # noqa: E402
+from plugins import danish_plugins  # noqa: E402
+
+BUILDER_CACHES = ("units", "posting", "get_auto_link", "auto_links")
+FIGURES = (
+    ("peak", "peak_mb", "MB"),
+    ("retained", "retained_mb", "MB"),
+    ("blocks", "blocks_per_entry", "per entry"),
+    ("max RSS", "max_rss_mb", "MB"),
+)
+
+
+def run_chain(entries, options_map):
+    errors = []
+    for plugin in danish_plugins.__plugins__:
+        entries, plugin_errors = plugin(entries, options_map)
+        errors.extend(plugin_errors)
+    return entries, errors
+
+
+@contextlib.contextmanager
+def uncached_builder():
+    """Swap the lru_cache functions of plugins.builder for the bare ones."""
+    saved = {name: getattr(builder, name) for name in BUILDER_CACHES}
+    for name, func in saved.items():
+        setattr(builder, name, func.__wrapped__)
+    try:
+        yield
+    finally:
+        for name, func in saved.items():
+            setattr(builder, name, func)
+
+
+def measure(entries, options_map):
+    tracemalloc.start()
+    result, _ = run_chain(entries, options_map)
+    retained, peak = tracemalloc.get_traced_memory()
+    blocks = sum(
+        stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+    )
+    tracemalloc.stop()
+    return {
+        "entries": len(result),
+        "peak_mb": peak / 1024 / 1024,
+        "retained_mb": retained / 1024 / 1024,
+        "blocks_per_entry": blocks / len(result),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_mode(args, no_builder_cache):
+    """Measure in a child process and return its figures."""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--years",
+        str(args.years),
+        "--entries",
+        str(args.entries),
+        "--json",
+    ]
+    if no_builder_cache:
+        command.append("--no-builder-cache")
+    output = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def compare(args):
+    shared = run_mode(args, False)
+    fresh = run_mode(args, True)
+    print(f"{shared['entries']} entries")
+    print(f"  {'':10} {'no cache':>9} {'builder':>9} {'change':>8}")
+    for label, key, unit in FIGURES:
+        change = (shared[key] - fresh[key]) / fresh[key] * 100
+        print(
+            f"  {label:10} {fresh[key]:9.2f} {shared[key]:9.2f} {change:+7.1f}%  {unit}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--entries", type=int, default=20000)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--no-builder-cache", action="store_true")
+    mode.add_argument("--compare", action="store_true")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.compare:
+        compare(args)
+        return
+
+    loader.initialize(use_cache=False)
+    with tempfile.TemporaryDirectory() as root:
+        main_file = generate_ledger(root, args.years, args.entries)
+        entries, options_map = raw_entries(main_file)
+        # Paths such as bilag/salg are relative to the ledger.
+        os.chdir(root)
+        if args.no_builder_cache:
+            with uncached_builder():
+                result = measure(entries, options_map)
+        else:
+            result = measure(entries, options_map)
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"{result['entries']} entries")
+    for label, key, unit in FIGURES:
+        print(f"  {label:10} {result[key]:8.2f} {unit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare the four-plugin chain with the single-pass danish_pipeline.
+
+Usage: python benchmarks/bench_pipeline.py [--years N] [--entries M] [--repeat R]
+
+A synthetic ledger of expenses, quick-mileage and sales invoices (about
+110000 entries by default) is generated and loaded without the Danish plugins, then
+both variants run on the same parsed entries. The run fails if their entries
+or errors differ.
+
+Nearly all of the time goes to expanding the entries, which both variants do
+the same way; walking the list once only saves loop overhead. Expect a ratio
+close to 1.0x; on a 109212-entry ledger the chain took 3.93s and the
+pipeline 4.18s (0.94x).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from beancount import loader
+
+# Ensure we can import the plugins
+sys.path.insert(0, os.getcwd())
+
+from benchmarks.bench_memory import run_chain  # noqa: E402
+from benchmarks.generate_ledger import generate_ledger  # noqa: E402
+from benchmarks.run_benchmarks import best_of, raw_entries  # noqa: E402
+from plugins import danish_plugins  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--entries", type=int, default=24000, help="per year")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    loader.initialize(use_cache=False)
+    with tempfile.TemporaryDirectory() as root:
+        main_file = generate_ledger(root, args.years, args.entries)
+        entries, options_map = raw_entries(main_file)
+        # Paths such as bilag/salg are relative to the ledger.
+        os.chdir(root)
+        print(f"Benchmarking {len(entries)} entries...")
+        chain_time, chain_result = best_of(args.repeat, run_chain, entries, options_map)
+        fused_time, fused_result = best_of(
+            args.repeat, danish_plugins.danish_pipeline, entries, options_map
+        )
+
+    if chain_result != fused_result:
+        print("ERROR: danish_pipeline output differs from the plugin chain")
+        return 1
+
+    print(f"Plugin chain:    {chain_time:8.3f}s")
+    print(f"danish_pipeline: {fused_time:8.3f}s")
+    print(f"Ratio:           {chain_time / fused_time:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
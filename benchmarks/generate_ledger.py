@@ -0,0 +1,162 @@
+"""
+Generate a synthetic ledger laid out like regnskab.beancount.
+
+Usage: python benchmarks/generate_ledger.py OUTPUT_DIR [--years N] [--entries M]
+
+Writes OUTPUT_DIR/regnskab.beancount, a kontoplan and one folder per year with
+M entries spread over the expenses_*, mileage and invoices files, using the
+u, quick-expense, quick-mileage and sales-invoice directives plus plain
+single-posting transactions for auto_fill_expenses.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+
+# Ensure we can import the plugins
+sys.path.insert(0, os.getcwd())
+
+from plugins import mileage  # noqa: E402
+
+ACCOUNTS = [
+    "Assets:Bank:Erhverv",
+    "Assets:Moms:Koeb",
+    "Assets:Debitorer",
+    "Liabilities:Moms:Salg",
+    "Liabilities:Kreditorer",
+    "Expenses:Personnel:Mileage",
+    "Expenses:Office:Supplies",
+    "Expenses:Insurance",
+    "Expenses:Software",
+    "Expenses:Food",
+    "Income:Salg:Momspligtigt",
+    "Equity:Opening-Balances",
+]
+
+EXPENSE_ACCOUNTS = [
+    "Expenses:Office:Supplies",
+    "Expenses:Insurance",
+    "Expenses:Software",
+]
+
+# (file, share of the year's entries)
+FILE_WEIGHTS = [
+    ("expenses_moms.beancount", 40),
+    ("expenses_momsfri.beancount", 15),
+    ("expenses_udland.beancount", 10),
+    ("expenses_repraesentation.beancount", 10),
+    ("mileage.beancount", 15),
+    ("invoices.beancount", 10),
+]
+
+VAT_TYPES = {
+    "expenses_moms.beancount": "standard",
+    "expenses_momsfri.beancount": "momsfri",
+    "expenses_udland.beancount": "u-moms",
+    "expenses_repraesentation.beancount": "restaurant",
+}
+
+PAYEES = ["Daarbak", "Tryg", "Adobe", "Jensen", "Netto", "DSB", "Apple", "Elgiganten"]
+CLIENTS = ["Kunde A/S", "Hansen ApS", "Nordisk IT", "Byg & Co", "Grøn Energi"]
+
+
+def amount(rng):
+    return f"{rng.randint(20, 20000)}.{rng.choice(['00', '50', '95'])}"
+
+
+def expense_line(rng, date, fname):
+    account = (
+        "Expenses:Food"
+        if fname == "expenses_repraesentation.beancount"
+        else rng.choice(EXPENSE_ACCOUNTS)
+    )
+    narration = f"{rng.choice(PAYEES)} {rng.randint(1, 9999)}"
+    kind = rng.random()
+    if kind < 0.6:
+        return f'{date} custom "u" {account} "{narration}" {amount(rng)} DKK\n'
+    if kind < 0.8:
+        return (
+            f'{date} custom "quick-expense" {account} "{narration}" '
+            f'{amount(rng)} DKK "{VAT_TYPES[fname]}"\n'
+        )
+    credit = '\n  credit: "Kreditorer"' if rng.random() < 0.3 else ""
+    return f'{date} * "{narration}"{credit}\n  {account}  {amount(rng)} DKK\n\n'
+
+
+def mileage_line(rng, date):
+    return f'{date} custom "quick-mileage" {rng.randint(5, 400)} KM\n'
+
+
+def invoice_line(rng, date, number):
+    lines = " ".join(
+        f'"Konsulentydelse {i};{rng.randint(1, 40)};{rng.choice([750, 950, 1150])}"'
+        for i in range(rng.randint(1, 4))
+    )
+    return (
+        f'{date} custom "sales-invoice" "{rng.choice(CLIENTS)}" '
+        f'"INV-{date.year}-{number:05d}" Income:Salg:Momspligtigt {lines}\n'
+    )
+
+
+def generate_year(rng, root, year, entries):
+    folder = os.path.join(root, str(year))
+    os.makedirs(folder, exist_ok=True)
+    start = datetime.date(year, 1, 1)
+    days = (datetime.date(year + 1, 1, 1) - start).days
+    total_weight = sum(weight for _, weight in FILE_WEIGHTS)
+    has_mileage_rate = mileage.find_rate(start) is not None
+
+    for fname, weight in FILE_WEIGHTS:
+        count = entries * weight // total_weight
+        if fname == "mileage.beancount" and not has_mileage_rate:
+            count = 0
+        dates = sorted(
+            start + datetime.timedelta(days=rng.randrange(days)) for _ in range(count)
+        )
+        with open(os.path.join(folder, fname), "w") as f:
+            for number, date in enumerate(dates, 1):
+                if fname == "mileage.beancount":
+                    f.write(mileage_line(rng, date))
+                elif fname == "invoices.beancount":
+                    f.write(invoice_line(rng, date, number))
+                else:
+                    f.write(expense_line(rng, date, fname))
+
+
+def generate_ledger(root, years=2, entries=1000, last_year=2026, seed=1):
+    """Write a synthetic ledger to root. Returns the path of the main file."""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "kontoplan.beancount"), "w") as f:
+        for account in ACCOUNTS:
+            f.write(f"1900-01-01 open {account} DKK\n")
+
+    year_list = list(range(last_year - years + 1, last_year + 1))
+    for year in year_list:
+        generate_year(rng, root, year, entries)
+
+    main_file = os.path.join(root, "regnskab.beancount")
+    with open(main_file, "w") as f:
+        f.write('option "title" "Synthetic Benchmark Ledger"\n')
+        f.write('option "operating_currency" "DKK"\n')
+        f.write('plugin "plugins.danish_plugins"\n')
+        f.write('include "kontoplan.beancount"\n')
+        for year in year_list:
+            f.write(f'include "{year}/*.beancount"\n')
+    return main_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("output")
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--entries", type=int, default=1000, help="entries per year")
+    parser.add_argument("--last-year", type=int, default=2026)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    path = generate_ledger(
+        args.output, args.years, args.entries, args.last_year, args.seed
+    )
+    print(f"Wrote {path}")
@@ -0,0 +1,173 @@
+"""
+Benchmark suite for the Danish plugins.
+
+Usage: python benchmarks/run_benchmarks.py [--scenario NAME ...] [--save]
+
+For each scenario a synthetic ledger is generated and measured:
+
+- load: full loader.load_file() time, best of --repeat runs
+- plugins: best time of each function in danish_plugins.__plugins__, run as a
+  chain on the parsed and booked entries
+- peak_mb: peak traced Python memory during a full load
+
+Results are compared with benchmarks/baselines.json and the run fails when a
+figure exceeds its baseline by more than --tolerance. Baselines are machine
+specific; refresh them with --save after an intended change.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from beancount import loader
+
+# Ensure we can import the plugins
+sys.path.insert(0, os.getcwd())
+
+from benchmarks.generate_ledger import generate_ledger  # noqa: E402
+from plugins import danish_plugins  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# name -> (years, entries per year)
+SCENARIOS = {
+    "small": (2, 1000),
+    "medium": (5, 5000),
+    "large": (10, 20000),
+}
+DEFAULT_SCENARIOS = ["small", "medium"]
+
+# Timing differences below this many seconds are treated as noise.
+NOISE_FLOOR_S = 0.02
+
+
+def timed(func, *args):
+    # Start every run from a clean heap so collections of earlier garbage do
+    # not land in the wrong measurement.
+    gc.collect()
+    t0 = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - t0, result
+
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        elapsed, result = timed(func, *args)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def raw_entries(main_file):
+    """Load the ledger without the Danish plugins, as they would receive it."""
+    raw_file = os.path.join(os.path.dirname(main_file), "raw.beancount")
+    with open(main_file) as src, open(raw_file, "w") as dst:
+        for line in src:
+            if not line.startswith("plugin "):
+                dst.write(line)
+    entries, _, options_map = loader.load_file(raw_file)
+    return entries, options_map
+
+
+def measure(main_file, repeat):
+    load_time, (entries, errors, _) = best_of(repeat, loader.load_file, main_file)
+
+    tracemalloc.start()
+    loader.load_file(main_file)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    raw, options_map = raw_entries(main_file)
+    plugins = {}
+    chain_entries = raw
+    for plugin in danish_plugins.__plugins__:
+        elapsed, (chain_entries, _) = best_of(
+            repeat, plugin, chain_entries, options_map
+        )
+        plugins[plugin.__name__] = round(elapsed, 4)
+
+    return {
+        "entries": len(entries),
+        "errors": len(errors),
+        "load_s": round(load_time, 4),
+        "plugins": plugins,
+        "peak_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def regressions(result, baseline, tolerance):
+    """Return a list of human readable regressions against a baseline."""
+    found = []
+    limit = 1 + tolerance
+    checks = [("load_s", result["load_s"], baseline.get("load_s"), NOISE_FLOOR_S)]
+    checks.append(("peak_mb", result["peak_mb"], baseline.get("peak_mb"), 0))
+    for name, value in result["plugins"].items():
+        base = baseline.get("plugins", {}).get(name)
+        checks.append((name, value, base, NOISE_FLOOR_S))
+    for name, value, base, floor in checks:
+        if base and value > base * limit and value - base > floor:
+            found.append(f"{name}: {value} > {base} (+{value / base - 1:.0%})")
+    return found
+
+
+def report(name, result):
+    print(f"{name}: {result['entries']} entries, {result['errors']} errors")
+    print(f"  load       {result['load_s']:8.3f}s")
+    for plugin, elapsed in result["plugins"].items():
+        print(f"  {plugin:<20} {elapsed:8.3f}s")
+    print(f"  peak       {result['peak_mb']:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), default=None
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--save", action="store_true", help="store as baselines")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Always measure real parsing and plugin work, never the pickle cache.
+    loader.initialize(use_cache=False)
+
+    try:
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    except OSError:
+        baselines = {}
+
+    results = {}
+    failed = False
+    for name in args.scenario or DEFAULT_SCENARIOS:
+        years, entries = SCENARIOS[name]
+        with tempfile.TemporaryDirectory() as root:
+            main_file = generate_ledger(root, years, entries)
+            result = measure(main_file, args.repeat)
+        results[name] = result
+        report(name, result)
+        if not args.save and name in baselines:
+            for message in regressions(result, baselines[name], args.tolerance):
+                failed = True
+                print(f"  REGRESSION {message}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baselines to {BASELINES}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Startup-time budget for plugins.danish_plugins.
+
+Usage: python benchmarks/startup_budget.py [LEDGER]
+
+Measures, in fresh interpreters, how long importing the plugin module and
+the first load of LEDGER take (default regnskab.beancount), and checks that
+no rendering dependency was imported along the way. Exits non-zero when a
+budget is exceeded, so it can run next to verify_setup.py.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+RUNS = 5
+
+# Seconds, best of RUNS fresh interpreters.
+BUDGETS = {
+    "plugin_import_s": 0.05,
+    "first_load_s": 0.5,
+}
+
+# Modules a ledger load must not pull in unless it renders invoices.
+HEAVY_MODULES = ["jinja2", "weasyprint", "multiprocessing", "concurrent.futures"]
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {cwd!r})
+from beancount import loader
+from beancount.core import data
+t0 = time.perf_counter()
+import plugins.danish_plugins
+t1 = time.perf_counter()
+loader.load_file({ledger!r})
+t2 = time.perf_counter()
+print(json.dumps({{
+    "plugin_import_s": t1 - t0,
+    "first_load_s": t2 - t1,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_once(ledger):
+    code = CHILD.format(cwd=os.getcwd(), ledger=ledger, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    ledger = sys.argv[1] if len(sys.argv) > 1 else "regnskab.beancount"
+    runs = [measure_once(ledger) for _ in range(RUNS)]
+
+    failed = False
+    for name, budget in BUDGETS.items():
+        best = min(run[name] for run in runs)
+        status = "Pass" if best <= budget else "FAIL"
+        failed = failed or best > budget
+        print(
+            f"[{status}] {name}: {best * 1000:.1f} ms (budget {budget * 1000:.0f} ms)"
+        )
+
+    heavy = sorted({m for run in runs for m in run["heavy_modules"]})
+    if heavy:
+        failed = True
+        print(f"[FAIL] heavy modules imported during load: {', '.join(heavy)}")
+    else:
+        print("[Pass] no rendering dependencies imported during load")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+from beancount import loader
+from beancount.parser import printer
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import closing  # noqa: E402
+from plugins.danish_plugins import source_filename  # noqa: E402
+
+
+def close_year(input_file, year, force=False, dry_run=False):
+    """
+    Write the opening balances of year + 1, move the folders up to year into
+    arkiv_<year>.beancount and drop them from the includes of input_file.
+    """
+    root = os.path.dirname(os.path.abspath(input_file))
+    with open(input_file, encoding="utf-8") as f:
+        text = f.read()
+    years = closing.closed_years(text, year)
+    if not years:
+        print(f"No open year folders up to {year} in {input_file}.")
+        return 1
+
+    opening_path = os.path.join(root, str(year + 1), closing.OPENING_FILE)
+    archive_path = os.path.join(root, f"arkiv_{year}.beancount")
+    for path in (opening_path, archive_path):
+        if os.path.exists(path) and not force:
+            print(f"{path} already exists, use --force to overwrite it.")
+            return 1
+
+    print(f"Loading {input_file}...")
+    entries, errors, options = loader.load_file(input_file)
+    if errors and not force:
+        printer.print_errors(errors)
+        print("Fix the errors above before closing, or use --force.")
+        return 1
+
+    closed_dirs = {os.path.join(root, str(y)) for y in years}
+    late = [
+        entry
+        for entry in entries
+        if entry.date.year > year
+        and os.path.dirname(source_filename(entry) or "") in closed_dirs
+    ]
+    if late:
+        for entry in late[:10]:
+            print(
+                f"{source_filename(entry)}:{entry.meta['lineno']}: dated {entry.date}"
+            )
+        print(f"Entries after {year} in a folder being closed, move them first.")
+        return 1
+
+    opening = closing.opening_entries(entries, options, year, opening_path, closed_dirs)
+    archive_text = closing.archive_file(text, years)
+    main_text = closing.close_main_file(text, year)
+    print(f"Closing {', '.join(map(str, years))}: {len(opening)} opening entries.")
+    if dry_run:
+        printer.print_entries(opening)
+        return 0
+
+    os.makedirs(os.path.dirname(opening_path), exist_ok=True)
+    with open(opening_path, "w", encoding="utf-8") as f:
+        f.write(f"; Lukning af {year}, dannet af close_year.py\n")
+        printer.print_entries(opening, file=f)
+    with open(archive_path, "w", encoding="utf-8") as f:
+        f.write(archive_text)
+    tmp_path = f"{input_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(main_text)
+    os.replace(tmp_path, input_file)
+    print(f"Wrote {opening_path}")
+    print(f"Wrote {archive_path}")
+    print(f"Updated {input_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Close a fiscal year.")
+    parser.add_argument("year", type=int)
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    sys.exit(close_year(args.ledger, args.year, args.force, args.dry_run))
@@ -0,0 +1,36 @@
+import argparse
+import datetime
+import sys
+import os
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import debitorer  # noqa: E402
+
+
+def report_open_items(input_file, as_of=None):
+    entries, errors, options = loader.load_file(input_file)
+    report = debitorer.open_items(entries, as_of)
+
+    print(f"{'Faktura':<16} {'Kunde':<24} {'Forfald':<10} {'Dage':>5} {'Saldo':>12}")
+    for item in report.items:
+        due = item.due_date.isoformat() if item.due_date else "-"
+        print(
+            f"{item.invoice_id:<16} {(item.client or '')[:24]:<24} {due:<10} "
+            f"{item.days_overdue:>5} {item.balance:>12}"
+        )
+    print()
+    for label, total in report.buckets.items():
+        print(f"{label:<16} {total:>12}")
+    if report.unmatched:
+        print(f"{'uden faktura':<16} {report.unmatched:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open debitor items with aging.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, default=None)
+    args = parser.parse_args()
+    report_open_items(args.ledger, args.as_of)
@@ -1,13 +1,138 @@
+import argparse
+import hashlib
+import itertools
+import json
 import sys
 import os
 from beancount import loader
 from beancount.parser import printer
 
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
 
-def export_ledger(input_file, output_file):
+from plugins import analytics  # noqa: E402
+from plugins import invoice_pdf  # noqa: E402
+from plugins.danish_plugins import source_filename  # noqa: E402
+from plugins import year_cache  # noqa: E402
+
+STATE_FILENAME = ".export-state.json"
+
+# Options that name the inputs rather than change how they are processed.
+UNHASHED_OPTIONS = {
+    "filename",
+    "include",
+    "input_hash",
+    "dcontext",
+    invoice_pdf.JOBS_OPTION,
+}
+
+# Output format: writer in plugins.analytics, beancount text otherwise.
+ANALYTICS_WRITERS = {"sqlite": "write_sqlite", "parquet": "write_parquet"}
+
+
+def write_options(f, options):
+    """Print options first for a valid beancount file."""
+    for key, value in sorted(options.items()):
+        if isinstance(value, (str, int, float)) and key not in [
+            "filename",
+            "include",
+        ]:
+            f.write(f'option "{key}" "{value}"\n')
+    f.write("\n")
+
+
+def file_digest(filename, cache):
+    """Content hash of a source file, or None if it cannot be read."""
+    if filename not in cache:
+        try:
+            with open(filename, "rb") as f:
+                cache[filename] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            cache[filename] = None
+    return cache[filename]
+
+
+def export_fingerprint(options):
+    """
+    Hash of what every year's output depends on besides its source files:
+    the plugin sources, as plugins.year_cache hashes them, and the options.
+    """
+    h = hashlib.sha256(year_cache.plugin_version().encode("utf-8"))
+    for key, value in sorted(options.items()):
+        if key in UNHASHED_OPTIONS:
+            continue
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        h.update(f"{key}\0{value!r}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def year_fingerprint(entries, digests, base=""):
+    """
+    Hash of base and the source files behind a year's entries: the ledger
+    files holding them, sales invoices included, and the trip-log CSVs.
+    """
+    filenames = sorted({source_filename(entry) or "" for entry in entries})
+    h = hashlib.sha256(base.encode("utf-8"))
+    for filename in filenames:
+        h.update(f"{filename}\0{file_digest(filename, digests)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def export_years(entries, options, output_file, force=False):
+    """
+    Write one file per year into a folder next to output_file and make
+    output_file include them. Years whose source files are unchanged since the
+    last export are not rewritten.
+    """
+    year_dir = os.path.splitext(output_file)[0]
+    os.makedirs(year_dir, exist_ok=True)
+    state_path = os.path.join(year_dir, STATE_FILENAME)
+    state = {} if force else load_state(state_path)
+    new_state = {}
+    digests = {}
+    base = export_fingerprint(options)
+    years = []
+
+    for year, year_entries in itertools.groupby(entries, key=lambda e: e.date.year):
+        year_entries = list(year_entries)
+        year = str(year)
+        years.append(year)
+        year_file = os.path.join(year_dir, f"{year}.beancount")
+        fingerprint = year_fingerprint(year_entries, digests, base)
+        new_state[year] = fingerprint
+        if state.get(year) == fingerprint and os.path.exists(year_file):
+            print(f"  {year}: unchanged")
+            continue
+        print(f"  {year}: {len(year_entries)} entries")
+        with open(year_file, "w") as f:
+            printer.print_entries(year_entries, file=f)
+
+    with open(output_file, "w") as f:
+        write_options(f, options)
+        for year in years:
+            relpath = os.path.relpath(
+                os.path.join(year_dir, f"{year}.beancount"),
+                os.path.dirname(os.path.abspath(output_file)),
+            )
+            f.write(f'include "{relpath}"\n')
+
+    with open(state_path, "w") as f:
+        json.dump(new_state, f, indent=1, sort_keys=True)
+
+
+def export_ledger(
+    input_file, output_file, per_year=False, force=False, output_format="beancount"
+):
     print(f"Loading {input_file}...")
-    # Ensure local plugins can be found
-    sys.path.insert(0, os.getcwd())
 
     entries, errors, options = loader.load_file(input_file)
 
@@ -17,24 +142,57 @@ def export_ledger(input_file, output_file):
             print(error)
         print("\nProceeding with export despite errors...\n")
 
-    print(f"Exporting {len(entries)} entries to {output_file}...")
-    with open(output_file, "w") as f:
-        # Print options first for a valid beancount file
-        for key, value in sorted(options.items()):
-            if isinstance(value, (str, int, float)) and key not in [
-                "filename",
-                "include",
-            ]:
-                f.write(f'option "{key}" "{value}"\n')
-        f.write("\n")
-
-        # Print entries
-        printer.print_entries(entries, file=f)
-
+    export_entries(entries, options, output_file, per_year, force, output_format)
     print("Done.")
 
 
+def export_entries(
+    entries,
+    options,
+    output_file,
+    per_year=False,
+    force=False,
+    output_format="beancount",
+):
+    """Write already loaded entries to output_file in output_format."""
+    print(f"Exporting {len(entries)} entries to {output_file}...")
+    if output_format in ANALYTICS_WRITERS:
+        writer = getattr(analytics, ANALYTICS_WRITERS[output_format])
+        count = writer(analytics.posting_rows(entries), output_file)
+        print(f"  {count} postings")
+    elif per_year:
+        export_years(entries, options, output_file, force)
+    else:
+        with open(output_file, "w") as f:
+            write_options(f, options)
+            printer.print_entries(entries, file=f)
+
+
 if __name__ == "__main__":
-    INPUT = "regnskab.beancount"
-    OUTPUT = "regnskab_genereret.beancount"
-    export_ledger(INPUT, OUTPUT)
+    parser = argparse.ArgumentParser(description="Export the processed ledger.")
+    parser.add_argument("input", nargs="?", default="regnskab.beancount")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument(
+        "--per-year",
+        action="store_true",
+        help="write one file per year and skip years whose inputs are unchanged",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rewrite every year with --per-year"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["beancount", *ANALYTICS_WRITERS],
+        default="beancount",
+        help="sqlite and parquet write one row per posting",
+    )
+    args = parser.parse_args()
+    if args.per_year and args.format != "beancount":
+        parser.error("--per-year only applies to the beancount format")
+    output = args.output or f"regnskab_genereret.{args.format}"
+    try:
+        export_ledger(args.input, output, args.per_year, args.force, args.format)
+    except ImportError as exc:
+        if args.format != "parquet":
+            raise
+        sys.exit(f"{exc}. The parquet format needs pyarrow: uv pip install pyarrow")
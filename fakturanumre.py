@@ -0,0 +1,57 @@
+import argparse
+import sys
+import os
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins.duplicates import location  # noqa: E402
+from plugins.invoice_registry import InvoiceRegistry  # noqa: E402
+
+
+def report_invoice_numbers(input_file, invoice_id=None):
+    print(f"Loading {input_file}...")
+    entries, errors, options = loader.load_file(input_file)
+    registry = InvoiceRegistry(entries)
+
+    if invoice_id:
+        invoice = registry.get(invoice_id)
+        if invoice is None:
+            print(f"Faktura {invoice_id} findes ikke.")
+            return 1
+        entry = invoice.entry
+        print(f"{invoice_id} {entry.date} {entry.payee}  ({location(entry)})")
+        return 0
+
+    for series, numbers in sorted(registry.numbers.items()):
+        print(
+            f"{series:<16} {len(numbers):>6} fakturaer  "
+            f"{registry.invoices[numbers[min(numbers)]].invoice_id} - "
+            f"{registry.invoices[numbers[max(numbers)]].invoice_id}"
+        )
+    for first, entry in registry.duplicates:
+        print(
+            f"Dublet: {first.invoice_id}  ({location(first.entry)} og {location(entry)})"
+        )
+    for last, entry in registry.out_of_order:
+        print(
+            f"Rækkefølge: {entry.meta['invoice']} ({entry.date}) efter "
+            f"{last.invoice_id} ({last.entry.date})"
+        )
+    gaps = registry.gaps()
+    for series, missing in gaps.items():
+        print(f"Huller i {series}: {', '.join(missing)}")
+    problems = len(registry.duplicates) + len(registry.out_of_order) + len(gaps)
+    print(f"{len(registry)} fakturaer, {problems} problemer.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check invoice numbers for duplicates and gaps."
+    )
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("--invoice", help="look up a single invoice id")
+    args = parser.parse_args()
+    sys.exit(report_invoice_numbers(args.ledger, args.invoice))
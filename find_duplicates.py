@@ -0,0 +1,32 @@
+import argparse
+import sys
+import os
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import duplicates  # noqa: E402
+
+
+def report_duplicates(input_file, window_days):
+    print(f"Loading {input_file}...")
+    entries, errors, options = loader.load_file(input_file)
+
+    pairs = duplicates.find_duplicates(entries, window_days)
+    for entry, matches in pairs:
+        print(f"{entry.date} {entry.narration}  ({duplicates.location(entry)})")
+        for other in matches:
+            print(f"  = {other.date} {other.narration}  ({duplicates.location(other)})")
+    print(f"Found {len(pairs)} likely duplicates.")
+    return 1 if pairs else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report likely duplicate bookings.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument(
+        "--window", type=int, default=duplicates.DEFAULT_WINDOW_DAYS, help="days"
+    )
+    args = parser.parse_args()
+    sys.exit(report_duplicates(args.ledger, args.window))
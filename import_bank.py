@@ -0,0 +1,59 @@
+import sys
+import os
+
+import click
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+import beangulp  # noqa: E402
+from beancount import loader  # noqa: E402
+from beancount.parser import printer  # noqa: E402
+
+from importers import dansk_bank  # noqa: E402
+from plugins.duplicates import DuplicateIndex  # noqa: E402
+
+# (regex searched in the bank text, account, VAT type)
+RULES = [
+    (r"adobe|github|google cloud", "Expenses:Software", "u-moms"),
+    (r"tryg|topdanmark|alm\. brand", "Expenses:Insurance", "momsfri"),
+    (r"restaurant|cafe|café", "Expenses:Food", "restaurant"),
+    (r"daarbak|lyreco|staples", "Expenses:Office:Supplies", "standard"),
+]
+
+IMPORTERS = [dansk_bank.Importer("Assets:Bank:Erhverv", RULES)]
+
+
+@click.command("stream")
+@click.argument("filepath", type=click.Path(exists=True))
+@click.option("-o", "--output", type=click.File("w"), default="-")
+@click.option(
+    "-e",
+    "--existing",
+    type=click.Path(exists=True),
+    help="Ledger whose transactions are skipped when imported again.",
+)
+def stream(filepath, output, existing):
+    """Convert a large statement row by row, writing entries as they are made."""
+    for imp in IMPORTERS:
+        if imp.identify(filepath):
+            break
+    else:
+        raise click.ClickException(f"No importer matches {filepath}")
+    known = None
+    if existing:
+        entries, _, _ = loader.load_file(existing)
+        known = DuplicateIndex(entries)
+    eprinter = printer.EntryPrinter()
+    errors = []
+    for entry in imp.iter_entries(filepath, known, errors):
+        output.write("\n")
+        output.write(eprinter(entry))
+    for error in errors:
+        click.echo(dansk_bank.format_error(error), err=True)
+
+
+if __name__ == "__main__":
+    ingest = beangulp.Ingest(IMPORTERS)
+    ingest.cli.add_command(stream)
+    ingest()
@@ -0,0 +1,184 @@
+"""
+Streaming beangulp importer for Danish bank CSV exports.
+
+Danish netbank exports are semicolon separated, use comma as decimal mark and
+dot as thousands separator ("-1.234,56") and write dates as DD.MM.YYYY (or
+with - or /). The column names differ between banks and are configurable;
+the defaults match Danske Bank ("Dato", "Tekst", "Beløb").
+
+Rows are read and converted one at a time by iter_entries(), so a statement
+of any size is imported in roughly constant memory. Each row is matched
+against compiled payee rules and turned into the same transaction
+auto_fill_expenses would produce: expense, VAT and bank postings plus the
+YYMMDD-Account link. Rows no rule matches get only the bank posting and the
+"!" flag so they stand out for manual booking. Rows already in the ledger
+(see plugins.duplicates) are skipped, and rows whose date or amount cannot
+be parsed are reported with their file and line and skipped.
+"""
+
+import csv
+import decimal
+import os
+import re
+import sys
+from collections import namedtuple
+
+from beancount.core import amount
+from beancount.core import data
+from beangulp import importer
+
+from plugins.danish_csv import parse_amount, parse_date
+from plugins.danish_plugins import Error, expense_postings, get_auto_link
+from plugins.duplicates import DuplicateIndex
+from plugins.vat import VatEngine
+
+D = decimal.Decimal
+
+# pattern: regular expression searched (case-insensitively) in the row text.
+Rule = namedtuple("Rule", "pattern account vat_type")
+
+
+class RuleSet:
+    """
+    Payee rules, each compiled once. The first rule in list order whose
+    pattern is found anywhere in the text wins, wherever it matches.
+    """
+
+    def __init__(self, rules, vat=None):
+        self.vat = vat or VatEngine()
+        self.rules = [Rule(*rule) for rule in rules]
+        self.compiled = []
+        for rule in self.rules:
+            if rule.vat_type not in self.vat.ore_splitters:
+                raise ValueError(f"Rule for {rule.account} has unknown VAT type")
+            regex = re.compile(rule.pattern, re.IGNORECASE)
+            # Only the account and VAT type of a rule are used, so a named
+            # group would be silently ignored.
+            if regex.groupindex:
+                raise ValueError(
+                    f"Rule for {rule.account} has named groups in {rule.pattern!r}"
+                )
+            self.compiled.append((regex.search, rule))
+
+    def match(self, text):
+        """Return the first Rule matching text, or None."""
+        for search, rule in self.compiled:
+            if search(text):
+                return rule
+        return None
+
+
+class Importer(importer.Importer):
+    def __init__(
+        self,
+        account,
+        rules=(),
+        currency="DKK",
+        encoding="utf-8-sig",
+        date_column="Dato",
+        text_column="Tekst",
+        amount_column="Beløb",
+        filename_pattern=r".*\.csv$",
+    ):
+        self.bank_account = account
+        self.ruleset = rules if isinstance(rules, RuleSet) else RuleSet(rules)
+        self.currency = currency
+        self.encoding = encoding
+        self.date_column = date_column
+        self.text_column = text_column
+        self.amount_column = amount_column
+        self.filename_regex = re.compile(filename_pattern, re.IGNORECASE)
+
+    def identify(self, filepath):
+        if not self.filename_regex.match(os.path.basename(filepath)):
+            return False
+        try:
+            with open(filepath, encoding=self.encoding, newline="") as f:
+                header = next(csv.reader(f, delimiter=";"), [])
+        except (OSError, UnicodeDecodeError):
+            return False
+        return {self.date_column, self.text_column, self.amount_column} <= set(header)
+
+    def account(self, filepath):
+        return self.bank_account
+
+    def build_entry(self, filepath, lineno, date, text, bank_amount):
+        """Turn one bank row into a transaction."""
+        meta = data.new_metadata(filepath, lineno)
+        rule = self.ruleset.match(text)
+        if rule is None:
+            posting = data.Posting(
+                self.bank_account,
+                amount.Amount(bank_amount, self.currency),
+                None,
+                None,
+                None,
+                None,
+            )
+            return data.Transaction(
+                meta, date, "!", None, text, data.EMPTY_SET, data.EMPTY_SET, [posting]
+            )
+        meta["vat_type"] = rule.vat_type
+        postings = expense_postings(
+            rule.account,
+            -bank_amount,
+            self.currency,
+            self.ruleset.vat.ore_splitters[rule.vat_type],
+            self.bank_account,
+        )
+        return data.Transaction(
+            meta,
+            date,
+            "*",
+            None,
+            text,
+            data.EMPTY_SET,
+            {get_auto_link(date, rule.account)},
+            postings,
+        )
+
+    def iter_entries(self, filepath, known=None, errors=None):
+        """
+        Yield one transaction per row without holding the file in memory.
+        Rows that claim a transaction in known (a DuplicateIndex) are
+        skipped; each known transaction absorbs one row at most. A row that
+        cannot be parsed is skipped and, if errors is a list, reported there
+        with its file and line.
+        """
+        with open(filepath, encoding=self.encoding, newline="") as f:
+            reader = csv.reader(f, delimiter=";")
+            header = next(reader, None)
+            if header is None:
+                return
+            date_index = header.index(self.date_column)
+            text_index = header.index(self.text_column)
+            amount_index = header.index(self.amount_column)
+            for lineno, row in enumerate(reader, 2):
+                if not "".join(row[date_index : date_index + 1]).strip():
+                    continue
+                try:
+                    date = parse_date(row[date_index])
+                    text = row[text_index].strip()
+                    bank_amount = parse_amount(row[amount_index])
+                except (IndexError, ValueError, decimal.InvalidOperation):
+                    if errors is not None:
+                        meta = data.new_metadata(filepath, lineno)
+                        errors.append(Error(meta, f"Invalid bank row: {row}", None))
+                    continue
+                entry = self.build_entry(filepath, lineno, date, text, bank_amount)
+                if known is not None and known.claim(entry) is not None:
+                    continue
+                yield entry
+
+    def extract(self, filepath, existing):
+        known = DuplicateIndex(existing) if existing else None
+        errors = []
+        entries = list(self.iter_entries(filepath, known, errors))
+        for error in errors:
+            print(format_error(error), file=sys.stderr)
+        return entries
+
+
+def format_error(error):
+    """file:line: message of an Error from iter_entries()."""
+    return f"{error.source['filename']}:{error.source['lineno']}: {error.message}"
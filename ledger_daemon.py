@@ -0,0 +1,258 @@
+"""
+Keep the plugin-processed ledger in memory and answer requests over a local
+socket, so a check or query does not pay for interpreter start-up, imports
+and a full parse every time.
+
+    PYTHONPATH=. uv run python ledger_daemon.py serve &
+    PYTHONPATH=. uv run python ledger_daemon.py check
+    PYTHONPATH=. uv run python ledger_daemon.py query ".run forfaldne-fakturaer"
+    PYTHONPATH=. uv run python ledger_daemon.py balance Assets:Bank --date 2025-06-30
+
+Requests and replies are single JSON lines on a Unix socket in .ledger-cache/.
+The year folders are polled for changes and only changed files are reloaded,
+see plugins.live_ledger.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from beancount.core import data
+from beancount.parser import printer
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins.live_ledger import LiveLedger  # noqa: E402
+
+SOCKET_NAME = os.path.join(".ledger-cache", "daemon.sock")
+POLL_INTERVAL_S = 0.5
+
+
+def socket_path(ledger):
+    return os.path.join(os.path.dirname(os.path.abspath(ledger)), SOCKET_NAME)
+
+
+def format_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def account_balances(ledger, accounts, date):
+    """{account: balance} at the end of date, sub-accounts included."""
+    date = datetime.date.fromisoformat(date) if date else datetime.date.today()
+    balances = ledger.balance_index()
+    return {
+        "ok": True,
+        "date": date.isoformat(),
+        "balances": {
+            account: str(balances.total(account, date)) for account in accounts
+        },
+    }
+
+
+def run_query(ledger, query):
+    """Run a bean-query statement, or ".run <name>" for a query directive."""
+    if query.startswith(".run "):
+        name = query[len(".run ") :].strip()
+        named = [
+            entry.query_string
+            for entry in ledger.entries
+            if isinstance(entry, data.Query) and entry.name == name
+        ]
+        if not named:
+            return {"ok": False, "error": f"No query named {name}"}
+        query = named[-1]
+
+    import beanquery
+
+    connection = beanquery.connect(
+        "beancount:",
+        entries=ledger.entries,
+        errors=ledger.errors,
+        options=ledger.options_map,
+    )
+    cursor = connection.execute(query)
+    return {
+        "ok": True,
+        "columns": [column.name for column in cursor.description],
+        "rows": [[format_value(value) for value in row] for row in cursor],
+    }
+
+
+class LedgerDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, ledger_file, poll_interval=POLL_INTERVAL_S):
+        self.lock = threading.Lock()
+        self.ledger = LiveLedger(ledger_file)
+        self.poll_interval = poll_interval
+        super().__init__(path, RequestHandler)
+
+    def refresh(self):
+        """Pick up changed files; callers hold the lock."""
+        changed = self.ledger.refresh()
+        for filename in changed:
+            print(f"Reloaded {filename}", flush=True)
+        return changed
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                self.refresh()
+
+    def handle_request_message(self, message):
+        command = message.get("command")
+        if command == "stop":
+            return {"ok": True}
+        with self.lock:
+            t0 = time.perf_counter()
+            reloaded = self.refresh()
+            ledger = self.ledger
+            if command == "check":
+                reply = {
+                    "ok": not ledger.errors,
+                    "entries": len(ledger.entries),
+                    "errors": [printer.format_error(error) for error in ledger.errors],
+                }
+            elif command == "query":
+                try:
+                    reply = run_query(ledger, message.get("query", ""))
+                except Exception as exc:
+                    reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            elif command == "balance":
+                try:
+                    reply = account_balances(
+                        ledger, message.get("accounts", []), message.get("date")
+                    )
+                except ValueError as exc:
+                    reply = {"ok": False, "error": str(exc)}
+            elif command == "status":
+                reply = {
+                    "ok": True,
+                    "ledger": ledger.filename,
+                    "files": len(ledger.sources) + 1,
+                    "entries": len(ledger.entries),
+                    "errors": len(ledger.errors),
+                }
+            else:
+                reply = {"ok": False, "error": f"Unknown command {command!r}"}
+            reply["reloaded"] = reloaded
+            reply["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        return reply
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            message = json.loads(line)
+            reply = self.server.handle_request_message(message)
+        except ValueError as exc:
+            message = {}
+            reply = {"ok": False, "error": f"Invalid request: {exc}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+        self.wfile.flush()
+        if message.get("command") == "stop":
+            # shutdown() waits for serve_forever(), so not from its thread.
+            threading.Thread(target=self.server.shutdown).start()
+
+
+def request(path, message, timeout=60):
+    """Send one request to a running daemon. Raises OSError if none is up."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(json.dumps(message).encode() + b"\n")
+        with client.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def serve(ledger_file, poll_interval=POLL_INTERVAL_S):
+    path = socket_path(ledger_file)
+    if os.path.exists(path):
+        try:
+            request(path, {"command": "status"}, timeout=5)
+        except OSError:
+            os.unlink(path)  # Left behind by a daemon that died
+        else:
+            print(f"A daemon is already serving {path}")
+            return 1
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    t0 = time.perf_counter()
+    server = LedgerDaemon(path, ledger_file, poll_interval)
+    print(
+        f"Loaded {len(server.ledger.entries)} entries in "
+        f"{time.perf_counter() - t0:.2f}s, listening on {path}",
+        flush=True,
+    )
+    threading.Thread(target=server.watch, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory ledger daemon.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Load and watch the ledger.")
+    serve_parser.add_argument("--poll", type=float, default=POLL_INTERVAL_S)
+    for name in ("check", "status", "stop"):
+        subparsers.add_parser(name)
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("query")
+    balance_parser = subparsers.add_parser("balance")
+    balance_parser.add_argument("accounts", nargs="+")
+    balance_parser.add_argument("--date", help="YYYY-MM-DD, default today")
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("--ledger", default="regnskab.beancount")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args.ledger, args.poll)
+
+    message = {"command": args.command}
+    if args.command == "query":
+        message["query"] = args.query
+    elif args.command == "balance":
+        message["accounts"] = args.accounts
+        message["date"] = args.date
+    try:
+        reply = request(socket_path(args.ledger), message)
+    except OSError as exc:
+        print(f"No daemon running for {args.ledger}: {exc}")
+        return 2
+
+    if args.command == "check":
+        for error in reply["errors"]:
+            print(error)
+    elif args.command == "balance" and reply["ok"]:
+        for account, balance in reply["balances"].items():
+            print(f"{reply['date']}  {account:<40} {balance:>16} DKK")
+    elif args.command == "query" and reply["ok"]:
+        print("\t".join(reply["columns"]))
+        for row in reply["rows"]:
+            print("\t".join("" if value is None else str(value) for value in row))
+    elif "error" in reply:
+        print(reply["error"])
+    else:
+        print(json.dumps(reply, indent=2))
+    return 0 if reply["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
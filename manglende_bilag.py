@@ -0,0 +1,56 @@
+import argparse
+import sys
+import os
+import time
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import bilag  # noqa: E402
+from plugins.duplicates import location  # noqa: E402
+
+
+def manglende_bilag(
+    input_file, year=None, window_days=bilag.DEFAULT_WINDOW_DAYS, full=False
+):
+    entries, errors, options = loader.load_file(input_file)
+    ledger_dir = os.path.dirname(os.path.abspath(input_file))
+
+    documents = []
+    for folder in options["documents"]:
+        root = os.path.join(ledger_dir, folder)
+        index = bilag.DocumentIndex(root, bilag.cache_path(ledger_dir, root))
+        t0 = time.perf_counter()
+        if index.update(full):
+            index.save()
+        found = list(index.documents())
+        print(
+            f"{folder}: {len(found)} bilag, {index.scanned} of {len(index.dirs)} "
+            f"folders scanned, {index.hashed} hashed "
+            f"({time.perf_counter() - t0:.3f}s)"
+        )
+        documents.extend(found)
+
+    matcher = bilag.ReceiptMatcher(documents, window_days)
+    if year:
+        entries = [entry for entry in entries if entry.date.year == year]
+    missing = bilag.missing_receipts(entries, matcher)
+    for entry in missing:
+        print(f"{entry.date} {entry.narration}  ({location(entry)})")
+    print(f"{len(missing)} udgifter uden bilag.")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report expenses without a bilag.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("--year", type=int)
+    parser.add_argument(
+        "--window", type=int, default=bilag.DEFAULT_WINDOW_DAYS, help="days"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="re-list every folder, not just changed"
+    )
+    args = parser.parse_args()
+    sys.exit(manglende_bilag(args.ledger, args.year, args.window, args.full))
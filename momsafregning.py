@@ -0,0 +1,37 @@
+import argparse
+import sys
+import os
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import moms  # noqa: E402
+
+
+def momsafregning(input_file, period, year=None, use_cache=True):
+    entries, errors, options = loader.load_file(input_file)
+    cache = moms.SettlementCache(options) if use_cache else None
+    settlements = moms.settle(entries, period, cache)
+    if year:
+        settlements = [s for s in settlements if s.start.year == year]
+
+    print(
+        f"{'Periode':<10} {'Salgsmoms':>12} {'Købsmoms':>12} "
+        f"{'Moms udland':>12} {'Rubrik A':>12} {'Afgift':>12}"
+    )
+    for s in settlements:
+        print(
+            f"{s.period:<10} {s.salgsmoms:>12} {s.koebsmoms:>12} "
+            f"{s.moms_udland:>12} {s.rubrik_a:>12} {s.afgift:>12}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VAT settlement per period.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("--period", choices=sorted(moms.PERIODS), default="quarter")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    momsafregning(args.ledger, args.period, args.year, not args.no_cache)
@@ -2,11 +2,13 @@
 set -e
 
 if [ -z "$1" ]; then
-    echo "Usage: ./new_year.sh <YEAR>"
+    echo "Usage: ./new_year.sh <YEAR> [--close]"
+    echo "  --close  close YEAR-1: write opening balances and archive it"
     exit 1
 fi
 
 YEAR=$1
+CLOSE=$2
 
 if [ -d "$YEAR" ]; then
     echo "Folder $YEAR already exists."
@@ -22,4 +24,10 @@ touch "$YEAR/expenses_repraesentation.beancount"
 touch "$YEAR/mileage.beancount"
 touch "$YEAR/invoices.beancount"
 
+if [ "$CLOSE" = "--close" ]; then
+    echo "Closing $((YEAR - 1))..."
+    PYTHONPATH=. uv run python close_year.py "$((YEAR - 1))"
+    exit 0
+fi
+
 echo "Done. Remember to add 'include \"$YEAR/*.beancount\"' to your regnskab.beancount if it's not already using a wildcard include."
@@ -0,0 +1,144 @@
+"""
+Posting-level exports for analysis outside beancount: an indexed SQLite
+database and a Parquet file.
+
+Every posting of every transaction becomes one row. Amounts are integer øre
+(hundredths of the currency unit), as in plugins.money, so sums are exact in
+any tool. Rows are generated lazily and written in batches of BATCH_SIZE, so
+memory use does not grow with the ledger.
+
+Parquet needs pyarrow (the "parquet" extra), which is only imported when
+writing Parquet.
+"""
+
+import itertools
+import os
+import sqlite3
+
+from beancount.core import data
+
+from plugins.duplicates import credit_posting
+from plugins.money import to_ore
+
+BATCH_SIZE = 10000
+
+# (name, SQLite type)
+COLUMNS = [
+    ("txn", "INTEGER"),
+    ("date", "TEXT"),
+    ("account", "TEXT"),
+    ("amount_ore", "INTEGER"),
+    ("currency", "TEXT"),
+    ("vat_type", "TEXT"),
+    ("credit_account", "TEXT"),
+    ("links", "TEXT"),
+    ("invoice", "TEXT"),
+    ("payee", "TEXT"),
+    ("narration", "TEXT"),
+    ("filename", "TEXT"),
+    ("lineno", "INTEGER"),
+]
+
+INDEXES = ["date", "account", "invoice", "vat_type", "credit_account"]
+
+
+def posting_rows(entries):
+    """
+    Yield a row tuple in COLUMNS order for every posting. vat_type is the
+    type the Danish plugins resolved and recorded in the transaction's meta.
+    """
+    txn_id = 0
+    for entry in entries:
+        if type(entry) is not data.Transaction:
+            continue
+        txn_id += 1
+        meta = entry.meta
+        filename = meta.get("filename", "")
+        vat_type = meta.get("vat_type")
+        credit = credit_posting(entry)
+        credit_account = credit.account if credit is not None else None
+        links = " ".join(sorted(entry.links)) if entry.links else None
+        date = entry.date.isoformat()
+        for posting in entry.postings:
+            units = posting.units
+            yield (
+                txn_id,
+                date,
+                posting.account,
+                to_ore(units.number),
+                units.currency,
+                vat_type,
+                credit_account,
+                links,
+                meta.get("invoice"),
+                entry.payee,
+                entry.narration,
+                filename,
+                meta.get("lineno"),
+            )
+
+
+def batches(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def write_sqlite(rows, path, batch_size=BATCH_SIZE):
+    """
+    Write rows to a new SQLite database at path, table postings, and index
+    the columns in INDEXES. Returns the number of rows written.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+        connection.execute(f"CREATE TABLE postings ({columns})")
+        insert = f"INSERT INTO postings VALUES ({', '.join('?' * len(COLUMNS))})"
+        count = 0
+        with connection:
+            for batch in batches(rows, batch_size):
+                connection.executemany(insert, batch)
+                count += len(batch)
+            # Indexing after the inserts is much faster than maintaining them.
+            for column in INDEXES:
+                connection.execute(
+                    f"CREATE INDEX postings_{column} ON postings ({column})"
+                )
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {"INTEGER": pa.int64(), "TEXT": pa.string()}
+    fields = [pa.field(name, types[kind]) for name, kind in COLUMNS]
+    fields[1] = pa.field("date", pa.date32())
+    return pa.schema(fields)
+
+
+def write_parquet(rows, path, batch_size=BATCH_SIZE):
+    """Write rows to a Parquet file at path. Returns the number of rows written."""
+    import datetime
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for batch in batches(rows, batch_size):
+            columns = [list(column) for column in zip(*batch)]
+            columns[1] = [datetime.date.fromisoformat(day) for day in columns[1]]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            count += len(batch)
+    os.replace(tmp_path, path)
+    return count
@@ -0,0 +1,186 @@
+"""
+As-of balance index: the balance of every account on any date.
+
+BalanceIndex walks the transactions once and keeps, per (account, currency),
+the dates on which the balance changed and the cumulative balance after each
+of them. balance(account, date) is then a binary search instead of summing
+every posting since the first entry, so "bank balance on date X", "VAT
+payable at quarter end" or "debitors at year end" cost O(log n) each.
+
+Balances are the sums of the posting units at the end of the given date, as
+plugins.closing.closing_balances() computes them. BalanceIndex(entries,
+weights=True) sums the posting weights instead, i.e. the price or cost
+converted amounts, which is what the DKK balances of plugins.saft need.
+
+update() takes the full, sorted entries of a new load. When they only add
+entries at the end, e.g. new bookings in the current year, the index is
+extended with those instead of being rebuilt. That is decided on a cheap
+fingerprint instead of comparing the whole ledger: the number of indexed
+entries, the last of them, and per source file a digest of the text up to
+and including the last indexed entry from that file. Appending to a file
+keeps its digest; an edit above that point changes it and forces a rebuild.
+Source files are taken from danish_plugins.source_filename(), so a sales
+invoice counts for the ledger file holding it, not for its PDF.
+"""
+
+import bisect
+import hashlib
+
+from beancount.core import convert
+from beancount.core import data
+from beancount.core.number import ZERO
+
+from plugins.danish_plugins import source_filename
+
+
+def prefix_digests(lines):
+    """
+    {filename: digest} of each file's text up to and including the entry on
+    the given line, i.e. its indented posting and metadata lines. Missing
+    files and names that are not files, such as "<auto_insert_open>", get
+    None.
+    """
+    digests = {}
+    for filename, lineno in lines.items():
+        try:
+            f = open(filename, "rb")
+        except OSError:
+            digests[filename] = None
+            continue
+        digest = hashlib.sha256()
+        with f:
+            for number, line in enumerate(f, 1):
+                if number > lineno and not (line[:1].isspace() and line.strip()):
+                    break
+                digest.update(line)
+        digests[filename] = digest.hexdigest()
+    return digests
+
+
+class _Series:
+    """Change dates and cumulative balances of one (account, currency)."""
+
+    __slots__ = ("dates", "totals")
+
+    def __init__(self):
+        self.dates = []
+        self.totals = []
+
+    def add(self, date, number):
+        if self.dates and self.dates[-1] == date:
+            self.totals[-1] += number
+        else:
+            self.dates.append(date)
+            self.totals.append((self.totals[-1] if self.totals else ZERO) + number)
+
+    def at(self, date):
+        index = bisect.bisect_right(self.dates, date)
+        return self.totals[index - 1] if index else ZERO
+
+
+class BalanceIndex:
+    """Cumulative balances per account, built from sorted entries."""
+
+    def __init__(self, entries=(), weights=False):
+        self.weights = weights
+        self.rebuild(entries)
+
+    def rebuild(self, entries):
+        """Discard the index and build it from entries."""
+        self.series = {}
+        # {account: [currencies]}, so queries by account need no scan.
+        self.currencies = {}
+        self.count = 0
+        self.last_entry = None
+        self.last_date = None
+        # {filename: line number of the last indexed entry from the file}
+        self.lines = {}
+        self.digests = None
+        self.extend(entries)
+
+    def extend(self, entries):
+        """Add entries dated on or after the last indexed entry."""
+        entries = list(entries)
+        if not entries:
+            return
+        if self.last_date is not None and entries[0].date < self.last_date:
+            raise ValueError(
+                f"Entry dated {entries[0].date} is before the last indexed "
+                f"entry ({self.last_date}); rebuild the index instead"
+            )
+        series = self.series
+        lines = self.lines
+        for entry in entries:
+            meta = entry.meta
+            filename = source_filename(entry) if meta else None
+            if filename is not None:
+                lineno = meta.get("lineno", 0)
+                if lineno > lines.get(filename, 0):
+                    lines[filename] = lineno
+            if type(entry) is not data.Transaction:
+                continue
+            date = entry.date
+            for posting in entry.postings:
+                if posting.units is None or posting.units.number is None:
+                    continue
+                units = convert.get_weight(posting) if self.weights else posting.units
+                key = (posting.account, units.currency)
+                account_series = series.get(key)
+                if account_series is None:
+                    account_series = series[key] = _Series()
+                    self.currencies.setdefault(posting.account, []).append(
+                        units.currency
+                    )
+                account_series.add(date, units.number)
+        self.count += len(entries)
+        self.last_entry = entries[-1]
+        self.last_date = self.last_entry.date
+
+    def update(self, entries):
+        """
+        Index the entries of a new load, extending the index when they only
+        append to the indexed ones. Returns True if it was extended and
+        False if it was rebuilt.
+        """
+        count = self.count
+        extended = count == 0 or (
+            len(entries) >= count
+            and entries[count - 1] == self.last_entry
+            and (len(entries) == count or entries[count].date >= self.last_date)
+            and self.digests == prefix_digests(self.lines)
+        )
+        if extended:
+            self.extend(entries[count:])
+        else:
+            self.rebuild(entries)
+        self.digests = prefix_digests(self.lines)
+        return extended
+
+    def balance(self, account, date, currency="DKK"):
+        """The balance of account in currency at the end of date."""
+        account_series = self.series.get((account, currency))
+        return ZERO if account_series is None else account_series.at(date)
+
+    def balances(self, date, prefix=""):
+        """
+        {(account, currency): balance} at the end of date of the accounts
+        starting with prefix, leaving out zero balances.
+        """
+        found = {}
+        for (account, currency), account_series in sorted(self.series.items()):
+            if not account.startswith(prefix):
+                continue
+            number = account_series.at(date)
+            if number:
+                found[account, currency] = number
+        return found
+
+    def total(self, prefix, date, currency="DKK"):
+        """The summed balance of the account prefix and its sub-accounts."""
+        total = ZERO
+        for account, currencies in self.currencies.items():
+            if currency in currencies and (
+                account == prefix or account.startswith(prefix + ":")
+            ):
+                total += self.series[account, currency].at(date)
+        return total
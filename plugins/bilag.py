@@ -0,0 +1,208 @@
+"""
+Persistent index of the bilag (receipt) documents and matching of receipts
+to expense transactions.
+
+DocumentIndex records path, size, mtime and SHA-256 of every file under a
+documents folder in .ledger-cache/. A directory whose mtime is unchanged is
+taken from the index without listing it, and a file is only hashed when it
+is new or its size or mtime changed, so updating the index of a large,
+mostly unchanged bilag/koeb tree costs one stat per directory. Editing a
+file in place does not change its directory's mtime; use update(full=True)
+to re-list every directory.
+
+Receipts are matched to transactions by, in order:
+
+- a "document" metadata value naming the file,
+- the transaction's "invoice" id or a link appearing as a name part of the
+  file, e.g. bilag/koeb/2025-03-14_F-1234.pdf,
+- date and amount from the file name, e.g. 2025-03-14_adobe_450,00.pdf is a
+  receipt of 450.00 DKK dated within the window of the booking date.
+"""
+
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict, namedtuple
+
+from beancount.core import data
+
+from plugins import danish_csv
+from plugins.duplicates import AUTO_LINK, credit_posting
+from plugins.money import to_ore
+
+CACHE_DIR = ".ledger-cache"
+DEFAULT_WINDOW_DAYS = 3
+
+# Expenses documented elsewhere, e.g. mileage by the trip log.
+EXEMPT_ACCOUNTS = ("Expenses:Personnel:Mileage",)
+
+Document = namedtuple("Document", "path size mtime_ns sha256")
+
+_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+_AMOUNT = re.compile(r"^-?(?:\d{1,3}(?:\.\d{3})+|\d+),\d{2}$|^-?\d+\.\d{2}$")
+_SEPARATORS = re.compile(r"[_\s]+")
+
+
+def file_digest(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(ledger_dir, root):
+    name = os.path.relpath(root, ledger_dir).replace(os.sep, "-").strip(".-")
+    return os.path.join(ledger_dir, CACHE_DIR, f"bilag-{name or 'root'}.json")
+
+
+class DocumentIndex:
+    """The files under root, keyed by directory relative to root."""
+
+    def __init__(self, root, path):
+        self.root = root
+        self.path = path
+        self.scanned = self.hashed = 0
+        try:
+            with open(path) as f:
+                self.dirs = json.load(f)
+        except (OSError, ValueError):
+            self.dirs = {}
+
+    def update(self, full=False):
+        """Rescan the directories that changed. Returns True if any did."""
+        self.scanned = self.hashed = 0
+        dirs = {}
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            folder = os.path.join(self.root, rel)
+            try:
+                mtime_ns = os.stat(folder).st_mtime_ns
+            except OSError:
+                continue
+            record = self.dirs.get(rel)
+            if record is None or record["mtime_ns"] != mtime_ns or full:
+                record = self.scan(rel, folder, mtime_ns, record)
+            dirs[rel] = record
+            pending.extend(os.path.join(rel, name) for name in record["subdirs"])
+        changed = self.scanned > 0 or dirs.keys() != self.dirs.keys()
+        self.dirs = dirs
+        return changed
+
+    def scan(self, rel, folder, mtime_ns, old):
+        self.scanned += 1
+        old_files = old["files"] if old else {}
+        files = {}
+        subdirs = []
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    known = old_files.get(entry.name)
+                    if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                        files[entry.name] = known
+                    else:
+                        self.hashed += 1
+                        digest = file_digest(entry.path)
+                        files[entry.name] = [st.st_size, st.st_mtime_ns, digest]
+        return {"mtime_ns": mtime_ns, "subdirs": sorted(subdirs), "files": files}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.dirs, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def documents(self):
+        for rel, record in self.dirs.items():
+            for name, (size, mtime_ns, digest) in record["files"].items():
+                path = os.path.join(self.root, rel, name)
+                yield Document(path, size, mtime_ns, digest)
+
+
+def parse_name(filename):
+    """(date or None, amount in øre or None, name parts) of a document name."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    date = None
+    match = _DATE.match(stem)
+    if match:
+        try:
+            date = datetime.date(*map(int, match.groups()))
+        except ValueError:
+            pass
+    amount = None
+    parts = _SEPARATORS.split(stem)
+    for part in parts:
+        if _AMOUNT.match(part):
+            if "," in part:
+                amount = to_ore(danish_csv.parse_amount(part))
+            else:
+                amount = to_ore(decimal.Decimal(part))
+    return date, amount, {stem, *parts}
+
+
+class ReceiptMatcher:
+    """Documents indexed by name, name part and (date, amount)."""
+
+    def __init__(self, documents, window_days=DEFAULT_WINDOW_DAYS):
+        self.window = window_days
+        self.by_name = {}
+        self.by_part = defaultdict(list)
+        self.by_date_amount = defaultdict(list)
+        for document in documents:
+            self.by_name[os.path.basename(document.path)] = document
+            date, amount, parts = parse_name(document.path)
+            for part in parts:
+                self.by_part[part].append(document)
+            if date is not None and amount is not None:
+                self.by_date_amount[date, abs(amount)].append(document)
+
+    def match(self, txn):
+        """The documents that belong to txn, possibly empty."""
+        name = txn.meta.get("document")
+        if name and os.path.basename(name) in self.by_name:
+            return [self.by_name[os.path.basename(name)]]
+        keys = [txn.meta.get("invoice")]
+        keys.extend(link for link in txn.links if not AUTO_LINK.match(link))
+        for key in keys:
+            if key and key in self.by_part:
+                return self.by_part[key]
+        credit = credit_posting(txn)
+        if credit is None or credit.units.number is None:
+            return []
+        amount = abs(to_ore(credit.units.number))
+        for offset in range(self.window + 1):
+            for days in {offset, -offset}:
+                date = txn.date + datetime.timedelta(days=days)
+                found = self.by_date_amount.get((date, amount))
+                if found:
+                    return found
+        return []
+
+
+def is_expense(txn):
+    return any(
+        posting.account.startswith("Expenses:")
+        and posting.account not in EXEMPT_ACCOUNTS
+        for posting in txn.postings
+    )
+
+
+def missing_receipts(entries, matcher):
+    """The expense transactions no document matches, in date order."""
+    return [
+        entry
+        for entry in entries
+        if type(entry) is data.Transaction
+        and is_expense(entry)
+        and not matcher.match(entry)
+    ]
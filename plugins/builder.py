@@ -0,0 +1,60 @@
+"""
+Shared construction of the postings and links the Danish plugins generate.
+
+A large ledger repeats the same few accounts, amounts and dates many times,
+so the generated objects are shared instead of built afresh for every
+transaction:
+
+- Postings and their Amounts are immutable and cached per (account, øre,
+  currency), with the account and currency strings interned.
+- Auto links (YYMMDD-Account) and the link sets holding only one of them
+  are cached per (date, account).
+
+The caches are bounded LRU caches, so a long-running process such as the
+ledger daemon does not grow without limit.
+"""
+
+import functools
+import sys
+
+from beancount.core import amount
+from beancount.core import data
+
+from plugins.money import from_ore
+
+CACHE_SIZE = 1 << 16
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def units(ore, currency):
+    """The Amount of ore øre in currency."""
+    return amount.Amount(from_ore(ore), sys.intern(currency))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def posting(account, ore, currency):
+    """A posting of ore øre in currency to account, without cost or meta."""
+    return data.Posting(
+        sys.intern(account), units(ore, currency), None, None, None, None
+    )
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def get_auto_link(date, account):
+    """Generate YYMMDD-AccountName link."""
+    date_str = date.strftime("%y%m%d")
+    safe_acc = account.replace(":", "-")
+    return f"{date_str}-{safe_acc}"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def auto_links(date, account):
+    """The link set holding only the auto link of (date, account)."""
+    return frozenset([get_auto_link(date, account)])
+
+
+def links_with(date, account, *extra):
+    """The auto link of (date, account) plus the non-empty extra links."""
+    links = auto_links(date, account)
+    extra = [link for link in extra if link and link not in links]
+    return links.union(extra) if extra else links
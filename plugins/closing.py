@@ -0,0 +1,201 @@
+"""
+Fiscal-year closing.
+
+Closing a year replaces the year folders up to and including it by opening
+balances for the next year, so the day-to-day ledger only loads open years:
+
+- opening_entries() builds the "Åbningsbalancer" transaction of the next
+  year from the closing balances of the balance sheet accounts, balanced
+  against Equity:Opening-Balances, which also absorbs the year's result.
+  Unpaid invoices get a transaction each with their invoice id and due_date,
+  so later payments still match them (see plugins.debitorer).
+- close_main_file() takes the closed year folders out of the includes (and
+  out of the plugins.year_cache configuration) of the main file.
+- archive_file() returns a main file that loads only the closed folders, so
+  the closed years can still be checked and browsed on demand.
+"""
+
+import datetime
+import os
+import re
+
+from beancount.core import amount
+from beancount.core import data
+
+from plugins import debitorer
+
+OPENING_ACCOUNT = "Equity:Opening-Balances"
+OPENING_FILE = "opening_balances.beancount"
+
+_YEAR_INCLUDE = re.compile(r'^include\s+"(\d{4})/\*\.beancount"\s*$')
+_YEAR_CACHE = re.compile(r'^plugin\s+"plugins\.year_cache"\s+"([^"]*)"\s*$')
+
+
+def balance_sheet_roots(options_map):
+    return tuple(
+        options_map[name] + ":"
+        for name in ("name_assets", "name_liabilities", "name_equity")
+    )
+
+
+def closing_balances(entries, end_date, options_map):
+    """{(account, currency): number} of the balance sheet accounts on end_date."""
+    roots = balance_sheet_roots(options_map)
+    balances = {}
+    for entry in entries:
+        if entry.date > end_date:
+            break
+        if type(entry) is not data.Transaction:
+            continue
+        for posting in entry.postings:
+            if posting.account.startswith(roots):
+                key = (posting.account, posting.units.currency)
+                balances[key] = balances.get(key, 0) + posting.units.number
+    return {key: number for key, number in sorted(balances.items()) if number}
+
+
+def _posting(account, number, currency):
+    return data.Posting(
+        account, amount.Amount(number, currency), None, None, None, None
+    )
+
+
+def opening_entries(entries, options_map, year, filename, closed_dirs=()):
+    """
+    The directives that open year + 1: Open entries of accounts opened in the
+    closed_dirs folders, the opening balances and one transaction per unpaid
+    invoice. entries must be sorted and plugin-processed, as the loader
+    returns them.
+    """
+    end_date = datetime.date(year, 12, 31)
+    date = datetime.date(year + 1, 1, 1)
+    balances = closing_balances(entries, end_date, options_map)
+    report = debitorer.open_items(entries, end_date)
+
+    closed_accounts = {
+        entry.account
+        for entry in entries
+        if type(entry) is data.Close and entry.date <= end_date
+    }
+    opens = [
+        entry
+        for entry in entries
+        if type(entry) is data.Open
+        and os.path.dirname(entry.meta["filename"]) in closed_dirs
+        and entry.account not in closed_accounts
+    ]
+
+    opening = []
+    invoiced = 0
+    for lineno, item in enumerate(report.items, 2):
+        meta = data.new_metadata(filename, lineno)
+        meta["invoice"] = item.invoice_id
+        if item.due_date:
+            meta["due_date"] = item.due_date.isoformat()
+        invoiced += item.balance
+        opening.append(
+            data.Transaction(
+                meta,
+                date,
+                "*",
+                item.client,
+                f"Åbningsbalance {item.invoice_id}",
+                data.EMPTY_SET,
+                frozenset([item.invoice_id]),
+                [
+                    _posting(debitorer.DEBITOR_ACCOUNT, item.balance, "DKK"),
+                    _posting(OPENING_ACCOUNT, -item.balance, "DKK"),
+                ],
+            )
+        )
+
+    postings = []
+    for (account, currency), number in balances.items():
+        if account == OPENING_ACCOUNT:
+            continue
+        if account == debitorer.DEBITOR_ACCOUNT and currency == "DKK":
+            number -= invoiced
+            if not number:
+                continue
+        postings.append(_posting(account, number, currency))
+    totals = {}
+    for posting in postings:
+        currency = posting.units.currency
+        totals[currency] = totals.get(currency, 0) + posting.units.number
+    for currency, total in sorted(totals.items()):
+        if total:
+            postings.append(_posting(OPENING_ACCOUNT, -total, currency))
+    balance_entry = data.Transaction(
+        data.new_metadata(filename, 1),
+        date,
+        "*",
+        None,
+        f"Åbningsbalancer {year + 1}",
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        postings,
+    )
+    return [*opens, balance_entry, *opening]
+
+
+def closed_years(text, year):
+    """The years up to year that the main file includes or caches."""
+    years = set()
+    for line in text.splitlines():
+        match = _YEAR_INCLUDE.match(line.strip())
+        if match and int(match.group(1)) <= year:
+            years.add(int(match.group(1)))
+        match = _YEAR_CACHE.match(line.strip())
+        if match:
+            cached = match.group(1).replace(",", " ").split()
+            years.update(int(y) for y in cached if int(y) <= year)
+    return sorted(years)
+
+
+def close_main_file(text, year):
+    """
+    Return the main file with the folders up to year taken out, and the
+    include of the year + 1 folder added if it is missing.
+    """
+    lines = []
+    next_include = f'include "{year + 1}/*.beancount"'
+    has_next = False
+    last_include = None
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        match = _YEAR_INCLUDE.match(stripped)
+        if match:
+            if int(match.group(1)) <= year:
+                continue
+            has_next = has_next or int(match.group(1)) == year + 1
+        match = _YEAR_CACHE.match(stripped)
+        if match:
+            cached = match.group(1).replace(",", " ").split()
+            remaining = [y for y in cached if int(y) > year]
+            if not remaining:
+                continue
+            line = f'plugin "plugins.year_cache" "{" ".join(remaining)}"\n'
+        if stripped.startswith("include "):
+            last_include = len(lines)
+        lines.append(line)
+    if not has_next:
+        if last_include is None:
+            lines.append(f"{next_include}\n")
+        else:
+            lines.insert(last_include + 1, f"{next_include}\n")
+    return "".join(lines)
+
+
+def archive_file(text, years):
+    """A main file loading only the given closed year folders."""
+    lines = []
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if _YEAR_INCLUDE.match(stripped) or _YEAR_CACHE.match(stripped):
+            continue
+        lines.append(line)
+    if lines and not lines[-1].endswith("\n"):
+        lines.append("\n")
+    lines.append(f"\n; Afsluttede år {years[0]}-{years[-1]}\n")
+    lines.extend(f'include "{year}/*.beancount"\n' for year in years)
+    return "".join(lines)
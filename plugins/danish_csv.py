@@ -0,0 +1,27 @@
+"""Parsing of Danish formatted CSV values (bank statements, trip logs)."""
+
+import csv
+import datetime
+import decimal
+
+D = decimal.Decimal
+
+
+def parse_amount(text):
+    """Parse a Danish formatted amount such as "-1.234,56"."""
+    return D(text.strip().replace(".", "").replace(",", "."))
+
+
+def parse_date(text):
+    """Parse DD.MM.YYYY (also with - or /) or ISO YYYY-MM-DD."""
+    text = text.strip()
+    if len(text) == 10 and text[4] == "-":
+        return datetime.date(int(text[0:4]), int(text[5:7]), int(text[8:10]))
+    return datetime.date(int(text[6:10]), int(text[3:5]), int(text[0:2]))
+
+
+def reader(f):
+    """A csv.reader for f, semicolon separated unless the header has none."""
+    header = f.readline()
+    f.seek(0)
+    return csv.reader(f, delimiter=";" if ";" in header else ",")
@@ -0,0 +1,13 @@
+"""
+Single-pass variant of plugins.danish_plugins.
+
+Produces the same entries and errors as the four-plugin chain but walks the
+ledger once. Use it in place of the chain:
+
+    plugin "plugins.danish_pipeline"
+"""
+
+from plugins import instrumentation
+from plugins.danish_plugins import danish_pipeline
+
+__plugins__ = instrumentation.instrument_chain([danish_pipeline])
@@ -1,202 +1,459 @@
 import decimal
 import datetime
-import getpass
+import functools
 import os
 from collections import namedtuple
 from beancount.core import data
 from beancount.core import amount
+from plugins import builder
+from plugins import danish_csv
+from plugins import instrumentation
+from plugins import invoice_pdf
+from plugins.builder import get_auto_link  # noqa: F401 (used by importers)
+from plugins.mileage import MileageContext
+from plugins.money import from_ore, to_ore
+from plugins.vat import (
+    SALES_VAT_TYPE,
+    VAT_BUY_ACCOUNT,
+    VAT_SELL_ACCOUNT,
+    VatEngine,
+    sales_vat,
+)
 
 D = decimal.Decimal
 Error = namedtuple("Error", "source message entry")
 
+# Sales invoices point meta["filename"] at their PDF, so Fava links the
+# document. The file holding the directive is kept under this key, which the
+# printer leaves out like every key starting with "__".
+SOURCE_KEY = "__source__"
 
-def get_auto_link(date, account):
-    """Generate YYMMDD-AccountName link."""
-    date_str = date.strftime("%y%m%d")
-    safe_acc = account.replace(":", "-")
-    return f"{date_str}-{safe_acc}"
 
+def source_filename(entry):
+    """The file an entry was read from, also for sales invoices."""
+    meta = entry.meta
+    return meta.get(SOURCE_KEY) or meta.get("filename")
 
-def quick_expense(entries, options_map):
+
+def expense_postings(expense_account, total, currency, split, credit_account):
     """
-    Legacy Syntax (keeping for compatibility):
-    custom "quick-expense" <ExpenseAccount> <Description> <Amount> <Type> [CreditAccount] [InvoiceRef] [NetAmount]
+    Build the expense, VAT and balancing postings for an expense of total,
+    using an øre split function from plugins.vat. The amounts are rounded to
+    øre and always balance exactly.
     """
-    new_entries = []
-    errors = []
-
-    for entry in entries:
-        is_legacy = isinstance(entry, data.Custom) and entry.type == "quick-expense"
-        is_short = isinstance(entry, data.Custom) and entry.type == "u"
-
-        if is_legacy or is_short:
-            if is_legacy:
-                if len(entry.values) < 4 or len(entry.values) > 7:
-                    errors.append(
-                        Error(
-                            entry.meta,
-                            "Expected 4 to 7 arguments for quick-expense",
-                            None,
-                        )
-                    )
-                    continue
-                expense_account = entry.values[0].value
-                description = entry.values[1].value
-                total_amount_wrapper = entry.values[2]
-                vat_type_arg = entry.values[3].value
-            else:  # is_short
-                if len(entry.values) != 3:
-                    errors.append(
-                        Error(
-                            entry.meta,
-                            "Expected 3 arguments for 'u' one-liner (Account, Description, Amount)",
-                            None,
-                        )
-                    )
-                    continue
-                expense_account = entry.values[0].value
-                description = entry.values[1].value
-                total_amount_wrapper = entry.values[2]
-                vat_type_arg = None  # Will infer from filename
-
-            # Detect VAT type from filename if not provided in args
-            vat_type = vat_type_arg
-            if not vat_type and "filename" in entry.meta:
-                fname = entry.meta["filename"]
-                if "expenses_moms.beancount" in fname:
-                    vat_type = "standard"
-                elif "expenses_momsfri.beancount" in fname:
-                    vat_type = "momsfri"
-                elif "expenses_udland.beancount" in fname:
-                    vat_type = "u-moms"
-                elif "expenses_repraesentation.beancount" in fname:
-                    vat_type = "restaurant"
-
-            if not vat_type:
-                vat_type = "momsfri"  # Fallback
-
-            credit_account = entry.meta.get("credit", "Assets:Bank:Erhverv")
-            if credit_account == "Kreditorer":
-                credit_account = "Liabilities:Kreditorer"
-            if is_legacy and len(entry.values) >= 5:
-                credit_account = entry.values[4].value
-
-            invoice_ref = entry.meta.get("invoice")
-            if is_legacy and not invoice_ref and len(entry.values) >= 6:
-                invoice_ref = entry.values[5].value
-
-            net_amount_hint = None
-            if is_legacy and len(entry.values) == 7:
-                net_amount_hint = entry.values[6].value
-
-            total_amount = total_amount_wrapper.value
-            if not isinstance(total_amount, amount.Amount):
-                errors.append(
-                    Error(entry.meta, "Third argument must be an amount", None)
-                )
-                continue
-
-            txn_amount = total_amount.number
-            currency = total_amount.currency
-
-            vat_buy_account = "Assets:Moms:Koeb"
-            vat_sell_account = "Liabilities:Moms:Salg"
-
-            expense_posting_amount = txn_amount
-            vat_buy_posting_amount = D(0)
-            vat_sell_posting_amount = D(0)
-
-            if vat_type == "standard":
-                net_amount = txn_amount / D("1.25")
-                vat_buy_posting_amount = txn_amount - net_amount
-                expense_posting_amount = net_amount
-            elif vat_type == "restaurant":
-                net_amount = txn_amount / D("1.25")
-                full_vat = txn_amount - net_amount
-                deductible_vat = full_vat * D("0.25")
-                vat_buy_posting_amount = deductible_vat
-                expense_posting_amount = txn_amount - deductible_vat
-            elif vat_type == "u-moms":
-                expense_posting_amount = txn_amount
-                vat_buy_posting_amount = txn_amount * D("0.25")
-                vat_sell_posting_amount = -vat_buy_posting_amount
-            elif vat_type == "momsfri":
-                pass
-            else:
-                errors.append(Error(entry.meta, f"Unknown VAT type: {vat_type}", None))
-                continue
-
-            if net_amount_hint and abs(
-                net_amount_hint.number - expense_posting_amount
-            ) > D("0.05"):
-                errors.append(
-                    Error(
-                        entry.meta,
-                        f"Net amount verification failed. Calc: {expense_posting_amount}, Hint: {net_amount_hint.number}",
-                        None,
-                    )
-                )
-
-            postings = [
-                data.Posting(
-                    expense_account,
-                    amount.Amount(expense_posting_amount, currency),
-                    None,
-                    None,
-                    None,
+    total_ore = to_ore(total)
+    expense_ore, vat_buy_ore, vat_sell_ore = split(total_ore)
+    postings = [builder.posting(expense_account, expense_ore, currency)]
+    if vat_buy_ore:
+        postings.append(builder.posting(VAT_BUY_ACCOUNT, vat_buy_ore, currency))
+    if vat_sell_ore:
+        postings.append(builder.posting(VAT_SELL_ACCOUNT, vat_sell_ore, currency))
+    postings.append(builder.posting(credit_account, -total_ore, currency))
+    return postings
+
+
+def expand_quick_expense(entry, errors, vat):
+    """
+    Turn a "quick-expense" or "u" Custom entry into a balanced transaction.
+    Returns None when the entry is invalid (the error is appended to errors).
+    """
+    is_legacy = entry.type == "quick-expense"
+
+    if is_legacy:
+        if len(entry.values) < 4 or len(entry.values) > 7:
+            errors.append(
+                Error(
+                    entry.meta,
+                    "Expected 4 to 7 arguments for quick-expense",
                     None,
                 )
-            ]
-            if vat_buy_posting_amount != 0:
-                postings.append(
-                    data.Posting(
-                        vat_buy_account,
-                        amount.Amount(vat_buy_posting_amount, currency),
-                        None,
-                        None,
-                        None,
-                        None,
-                    )
-                )
-            if vat_sell_posting_amount != 0:
-                postings.append(
-                    data.Posting(
-                        vat_sell_account,
-                        amount.Amount(vat_sell_posting_amount, currency),
-                        None,
-                        None,
-                        None,
-                        None,
-                    )
-                )
-            postings.append(
-                data.Posting(
-                    credit_account,
-                    amount.Amount(-txn_amount, currency),
-                    None,
-                    None,
+            )
+            return None
+        expense_account = entry.values[0].value
+        description = entry.values[1].value
+        total_amount_wrapper = entry.values[2]
+        vat_type_arg = entry.values[3].value
+    else:  # is_short
+        if len(entry.values) != 3:
+            errors.append(
+                Error(
+                    entry.meta,
+                    "Expected 3 arguments for 'u' one-liner (Account, Description, Amount)",
                     None,
+                )
+            )
+            return None
+        expense_account = entry.values[0].value
+        description = entry.values[1].value
+        total_amount_wrapper = entry.values[2]
+        vat_type_arg = None  # Will infer from filename
+
+    # Detect VAT type from filename if not provided in args
+    vat_type = vat_type_arg
+    if not vat_type and "filename" in entry.meta:
+        vat_type = vat.type_for_file(entry.meta["filename"])
+
+    if not vat_type:
+        vat_type = "momsfri"  # Fallback
+
+    credit_account = entry.meta.get("credit", "Assets:Bank:Erhverv")
+    if credit_account == "Kreditorer":
+        credit_account = "Liabilities:Kreditorer"
+    if is_legacy and len(entry.values) >= 5:
+        credit_account = entry.values[4].value
+
+    invoice_ref = entry.meta.get("invoice")
+    if is_legacy and not invoice_ref and len(entry.values) >= 6:
+        invoice_ref = entry.values[5].value
+
+    net_amount_hint = None
+    if is_legacy and len(entry.values) == 7:
+        net_amount_hint = entry.values[6].value
+
+    total_amount = total_amount_wrapper.value
+    if not isinstance(total_amount, amount.Amount):
+        errors.append(Error(entry.meta, "Third argument must be an amount", None))
+        return None
+
+    split = vat.ore_splitters.get(vat_type)
+    if split is None:
+        errors.append(Error(entry.meta, f"Unknown VAT type: {vat_type}", None))
+        return None
+
+    postings = expense_postings(
+        expense_account,
+        total_amount.number,
+        total_amount.currency,
+        split,
+        credit_account,
+    )
+
+    if net_amount_hint:
+        expense_posting_amount = postings[0].units.number
+        if abs(net_amount_hint.number - expense_posting_amount) > D("0.05"):
+            errors.append(
+                Error(
+                    entry.meta,
+                    f"Net amount verification failed. Calc: {expense_posting_amount}, Hint: {net_amount_hint.number}",
                     None,
                 )
             )
 
-            links = {get_auto_link(entry.date, expense_account)}
-            meta = entry.meta.copy()
-            if invoice_ref:
-                meta["invoice"] = invoice_ref
-                links.add(invoice_ref)
-
-            txn = data.Transaction(
-                meta,
-                entry.date,
-                "*",
-                None,
-                description,
-                data.EMPTY_SET,
-                links,
-                postings,
+    # The Custom entry is dropped, so its meta is reused and updated in place.
+    meta = entry.meta
+    meta["vat_type"] = vat_type
+    if invoice_ref:
+        meta["invoice"] = invoice_ref
+    links = builder.links_with(entry.date, expense_account, invoice_ref)
+
+    return data.Transaction(
+        meta,
+        entry.date,
+        "*",
+        None,
+        description,
+        data.EMPTY_SET,
+        links,
+        postings,
+    )
+
+
+def fill_expense(entry, errors, vat):
+    """
+    Add VAT and balancing postings to a single-posting transaction in a typed
+    expense file. Other transactions are returned unchanged.
+    """
+    if len(entry.postings) != 1 or "filename" not in entry.meta:
+        return entry
+
+    # Detect VAT type from filename
+    vat_type = vat.type_for_file(entry.meta["filename"])
+    if not vat_type:
+        return entry
+
+    p = entry.postings[0]
+    expense_account = p.account
+
+    # Add Balancing Posting
+    credit_account = entry.meta.get("credit", "Assets:Bank:Erhverv")
+    if credit_account == "Kreditorer":
+        credit_account = "Liabilities:Kreditorer"  # Shortcut
+
+    new_postings = expense_postings(
+        expense_account,
+        p.units.number,
+        p.units.currency,
+        vat.ore_splitters[vat_type],
+        credit_account,
+    )
+
+    # Links
+    links = builder.links_with(
+        entry.date, expense_account, *entry.links, entry.meta.get("invoice")
+    )
+    # The original transaction is replaced, so its meta is updated in place.
+    entry.meta["vat_type"] = vat_type
+
+    return entry._replace(postings=new_postings, links=links)
+
+
+def mileage_transaction(meta, date, legs, purpose=None):
+    """Build a mileage payout transaction from (km, rate) legs."""
+    payout_ore = sum(to_ore(km * rate) for km, rate in legs)
+    description = "Mileage: " + " + ".join(
+        f"{km} km @ {rate} DKK/km" for km, rate in legs
+    )
+    if purpose:
+        description = f"{description} ({purpose})"
+    postings = [
+        builder.posting("Expenses:Personnel:Mileage", payout_ore, "DKK"),
+        builder.posting("Assets:Bank:Erhverv", -payout_ore, "DKK"),
+    ]
+    return data.Transaction(
+        meta,
+        date,
+        "*",
+        None,
+        description,
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        postings,
+    )
+
+
+def expand_mileage(entry, errors, context):
+    """
+    Queue the trip of a "quick-mileage" Custom entry in context; the Custom
+    entry is dropped. mileage_transactions() pays it out.
+    """
+    if len(entry.values) != 1:
+        errors.append(Error(entry.meta, "Expected 1 argument for quick-mileage", None))
+        return None
+    dist_wrapper = entry.values[0]
+    dist_obj = dist_wrapper.value
+    if not isinstance(dist_obj, amount.Amount):
+        errors.append(Error(entry.meta, "Argument must be an amount", None))
+        return None
+    context.add(entry.meta, entry.date, dist_obj.number)
+    return None
+
+
+def read_trip_log(filename, errors):
+    """Yield (meta, date, km, purpose) for each row of a trip log CSV."""
+    with open(filename, encoding="utf-8-sig", newline="") as f:
+        rows = danish_csv.reader(f)
+        next(rows, None)  # Header
+        for lineno, row in enumerate(rows, 2):
+            if not row or not "".join(row).strip():
+                continue
+            meta = data.new_metadata(filename, lineno)
+            try:
+                date = danish_csv.parse_date(row[0])
+                km = danish_csv.parse_amount(row[1])
+            except (IndexError, ValueError, decimal.InvalidOperation):
+                errors.append(Error(meta, f"Invalid trip log row: {row}", None))
+                continue
+            purpose = row[2].strip() if len(row) > 2 else ""
+            yield meta, date, km, purpose
+
+
+def trip_log_path(entry):
+    """The CSV file of a "trip-log" entry, relative to the file holding it."""
+    return os.path.join(os.path.dirname(entry.meta["filename"]), entry.values[0].value)
+
+
+def trip_logs(entries):
+    """The CSV files read by the "trip-log" entries among entries."""
+    return sorted(
+        {
+            trip_log_path(entry)
+            for entry in entries
+            if type(entry) is data.Custom
+            and entry.type == "trip-log"
+            and entry.values
+            and isinstance(entry.values[0].value, str)
+        }
+    )
+
+
+def add_includes(options_map, filenames):
+    """
+    Register files read outside the include tree in options_map["include"],
+    whose timestamps the loader's pickle cache and Fava's watcher check.
+    """
+    options_map["include"] = sorted(set(options_map["include"]).union(filenames))
+
+
+def expand_trip_log(entry, errors, context):
+    """
+    Queue the trips of a "trip-log" Custom entry in context, to be paid out
+    one per trip or, with "monthly", one per calendar month. The CSV path is
+    relative to the file holding the entry; rows are date;km;purpose after a
+    header line.
+    """
+    values = [value.value for value in entry.values]
+    if not 1 <= len(values) <= 2 or (values[1:] and values[1] != "monthly"):
+        errors.append(
+            Error(entry.meta, 'Expected a CSV path and optional "monthly"', None)
+        )
+        return None
+    monthly = len(values) == 2
+    filename = trip_log_path(entry)
+    if not os.path.exists(filename):
+        errors.append(Error(entry.meta, f"Trip log not found: {filename}", None))
+        return None
+
+    log = (entry.meta["filename"], entry.meta["lineno"])
+    for meta, date, km, purpose in read_trip_log(filename, errors):
+        month = (log, date.year, date.month) if monthly else None
+        context.add(meta, date, km, purpose, month)
+    return None
+
+
+def mileage_transactions(context, errors):
+    """
+    Pay out the trips queued in context in date order, so each trip is paid
+    at the tier of the kilometres driven before it in its year.
+    """
+    txns = []
+    months = {}
+    for trip in context.trips_by_date():
+        legs = context.legs(trip.date, trip.km)
+        if legs is None:
+            errors.append(
+                Error(trip.meta, f"No mileage rate found for {trip.date}", None)
             )
-            new_entries.append(txn)
+        elif trip.month is None:
+            txns.append(mileage_transaction(trip.meta, trip.date, legs, trip.purpose))
+        else:
+            month = months.setdefault(trip.month, [trip.meta, trip.date, {}])
+            month[1] = trip.date
+            for leg_km, rate in legs:
+                month[2][rate] = month[2].get(rate, 0) + leg_km
+    for (_, year, month_number), (meta, date, km_by_rate) in months.items():
+        legs = [(km, rate) for rate, km in km_by_rate.items()]
+        txns.append(mileage_transaction(meta, date, legs, f"{year}-{month_number:02d}"))
+    return txns
+
+
+class InvoiceContext:
+    """
+    Per-load state shared by all sales-invoice entries of one run. Render
+    jobs go to the pending list, normally invoice_pdf.new_queue(options_map).
+    """
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.loaded = False
+        self.manifest = None
+        self.template_version = None
+
+    def load(self):
+        """Read the manifest and template state on the first invoice only."""
+        self.manifest = invoice_pdf.load_manifest()
+        self.template_version = invoice_pdf.template_mtime()
+        self.loaded = True
+
+
+def expand_sales_invoice(entry, errors, context):
+    """
+    Turn a "sales-invoice" Custom entry into a debitor transaction linked by
+    its invoice id, so payments can be matched with ^<invoice id>. The PDF is
+    not rendered here: a missing or stale PDF is queued for render_invoices.py.
+    """
+    if len(entry.values) < 4:
+        errors.append(Error(entry.meta, "Expected at least 4 arguments", None))
+        return None
+    client_name = entry.values[0].value
+    invoice_id = entry.values[1].value
+    income_account = entry.values[2].value
+    line_item_strs = entry.values[3:]
+    items = []
+    total_net = D(0)
+    for item_str in line_item_strs:
+        parts = item_str.value.split(";")
+        if len(parts) != 3:
+            continue
+        qty, price = D(parts[1]), D(parts[2])
+        line_total = qty * price
+        items.append(
+            {
+                "desc": parts[0],
+                "qty": qty,
+                "price": price,
+                "line_total": line_total,
+            }
+        )
+        total_net += line_total
+    net_ore = to_ore(total_net)
+    vat_ore = sales_vat(net_ore)
+    total_net = from_ore(net_ore)
+    vat_amount = from_ore(vat_ore)
+    total_gross = from_ore(net_ore + vat_ore)
+    date = entry.date
+    due_date = date + datetime.timedelta(days=14)
+    meta = entry.meta.copy()
+    meta["due_date"] = due_date.isoformat()
+    meta["invoice"] = invoice_id
+    meta["vat_type"] = SALES_VAT_TYPE
+    filepath = invoice_pdf.invoice_path(invoice_id)
+    meta[SOURCE_KEY] = entry.meta["filename"]
+    meta["filename"] = os.path.abspath(filepath)
+    if not context.loaded:
+        context.load()
+    digest = invoice_pdf.input_digest(
+        invoice_id,
+        date,
+        due_date,
+        client_name,
+        items,
+        (total_net, vat_amount, total_gross),
+        context.template_version,
+    )
+    job = invoice_pdf.InvoiceJob(
+        filepath,
+        invoice_id,
+        date,
+        due_date,
+        client_name,
+        items,
+        total_net,
+        vat_amount,
+        total_gross,
+        digest,
+    )
+    if invoice_pdf.needs_render(job, context.manifest):
+        context.pending.append(job)
+    postings = [
+        builder.posting("Assets:Debitorer", net_ore + vat_ore, "DKK"),
+        builder.posting(income_account, -net_ore, "DKK"),
+        builder.posting("Liabilities:Moms:Salg", -vat_ore, "DKK"),
+    ]
+    return data.Transaction(
+        meta,
+        date,
+        "*",
+        client_name,
+        f"Invoice {invoice_id}",
+        data.EMPTY_SET,
+        {invoice_id},
+        postings,
+    )
+
+
+def quick_expense(entries, options_map):
+    """
+    Legacy Syntax (keeping for compatibility):
+    custom "quick-expense" <ExpenseAccount> <Description> <Amount> <Type> [CreditAccount] [InvoiceRef] [NetAmount]
+    """
+    new_entries = []
+    errors = []
+    vat = VatEngine()
+    for entry in entries:
+        if isinstance(entry, data.Custom) and entry.type in ("quick-expense", "u"):
+            txn = expand_quick_expense(entry, errors, vat)
+            if txn is not None:
+                new_entries.append(txn)
         else:
             new_entries.append(entry)
     return new_entries, errors
@@ -208,286 +465,125 @@ def auto_fill_expenses(entries, options_map):
     """
     new_entries = []
     errors = []
-
-    vat_buy_account = "Assets:Moms:Koeb"
-    vat_sell_account = "Liabilities:Moms:Salg"
-
+    vat = VatEngine()
     for entry in entries:
-        if isinstance(entry, data.Transaction) and "filename" in entry.meta:
-            filename = entry.meta["filename"]
-
-            # Detect VAT type from filename
-            vat_type = None
-            if "expenses_moms.beancount" in filename:
-                vat_type = "standard"
-            elif "expenses_momsfri.beancount" in filename:
-                vat_type = "momsfri"
-            elif "expenses_udland.beancount" in filename:
-                vat_type = "u-moms"
-            elif "expenses_repraesentation.beancount" in filename:
-                vat_type = "restaurant"
-
-            if vat_type and len(entry.postings) == 1:
-                p = entry.postings[0]
-                expense_account = p.account
-                txn_amount = p.units.number
-                currency = p.units.currency
-
-                expense_posting_amount = txn_amount
-                vat_buy_posting_amount = D(0)
-                vat_sell_posting_amount = D(0)
-
-                if vat_type == "standard":
-                    net_amount = txn_amount / D("1.25")
-                    vat_buy_posting_amount = txn_amount - net_amount
-                    expense_posting_amount = net_amount
-                elif vat_type == "restaurant":
-                    net_amount = txn_amount / D("1.25")
-                    full_vat = txn_amount - net_amount
-                    deductible_vat = full_vat * D("0.25")
-                    vat_buy_posting_amount = deductible_vat
-                    expense_posting_amount = txn_amount - deductible_vat
-                elif vat_type == "u-moms":
-                    expense_posting_amount = txn_amount
-                    vat_buy_posting_amount = txn_amount * D("0.25")
-                    vat_sell_posting_amount = -vat_buy_posting_amount
-
-                # Update first posting
-                new_postings = [
-                    data.Posting(
-                        expense_account,
-                        amount.Amount(expense_posting_amount, currency),
-                        None,
-                        None,
-                        None,
-                        None,
-                    )
-                ]
-
-                # Add VAT postings
-                if vat_buy_posting_amount != 0:
-                    new_postings.append(
-                        data.Posting(
-                            vat_buy_account,
-                            amount.Amount(vat_buy_posting_amount, currency),
-                            None,
-                            None,
-                            None,
-                            None,
-                        )
-                    )
-                if vat_sell_posting_amount != 0:
-                    new_postings.append(
-                        data.Posting(
-                            vat_sell_account,
-                            amount.Amount(vat_sell_posting_amount, currency),
-                            None,
-                            None,
-                            None,
-                            None,
-                        )
-                    )
-
-                # Add Balancing Posting
-                credit_account = entry.meta.get("credit", "Assets:Bank:Erhverv")
-                if credit_account == "Kreditorer":
-                    credit_account = "Liabilities:Kreditorer"  # Shortcut
-                new_postings.append(
-                    data.Posting(
-                        credit_account,
-                        amount.Amount(-txn_amount, currency),
-                        None,
-                        None,
-                        None,
-                        None,
-                    )
-                )
-
-                # Links
-                links = set(entry.links) if entry.links else set()
-                links.add(get_auto_link(entry.date, expense_account))
-                if "invoice" in entry.meta:
-                    links.add(entry.meta["invoice"])
-
-                new_txn = entry._replace(postings=new_postings, links=links)
-                new_entries.append(new_txn)
-                continue
-
+        if isinstance(entry, data.Transaction):
+            entry = fill_expense(entry, errors, vat)
         new_entries.append(entry)
-
     return new_entries, errors
 
 
 def quick_mileage(entries, options_map):
     new_entries = []
     errors = []
-    RATES = {2025: D("3.80"), 2026: D("3.82")}
+    context = MileageContext()
     for entry in entries:
         if isinstance(entry, data.Custom) and entry.type == "quick-mileage":
-            if len(entry.values) != 1:
-                errors.append(
-                    Error(entry.meta, "Expected 1 argument for quick-mileage", None)
-                )
-                continue
-            dist_wrapper = entry.values[0]
-            dist_obj = dist_wrapper.value
-            if not isinstance(dist_obj, amount.Amount):
-                errors.append(Error(entry.meta, "Argument must be an amount", None))
-                continue
-            dist = dist_obj.number
-            year = entry.date.year
-            rate = RATES.get(year)
-            if not rate:
-                errors.append(
-                    Error(entry.meta, f"No mileage rate found for year {year}", None)
-                )
-                continue
-            payout = (dist * rate).quantize(D("0.01"))
-            description = f"Mileage: {dist} km @ {rate} DKK/km"
-            postings = [
-                data.Posting(
-                    "Expenses:Personnel:Mileage",
-                    amount.Amount(payout, "DKK"),
-                    None,
-                    None,
-                    None,
-                    None,
-                ),
-                data.Posting(
-                    "Assets:Bank:Erhverv",
-                    amount.Amount(-payout, "DKK"),
-                    None,
-                    None,
-                    None,
-                    None,
-                ),
-            ]
-            txn = data.Transaction(
-                entry.meta,
-                entry.date,
-                "*",
-                None,
-                description,
-                data.EMPTY_SET,
-                data.EMPTY_SET,
-                postings,
-            )
-            new_entries.append(txn)
+            expand_mileage(entry, errors, context)
+        elif isinstance(entry, data.Custom) and entry.type == "trip-log":
+            expand_trip_log(entry, errors, context)
         else:
             new_entries.append(entry)
+    new_entries.extend(mileage_transactions(context, errors))
+    add_includes(options_map, trip_logs(entries))
     return new_entries, errors
 
 
 def sales_invoice(entries, options_map):
     new_entries = []
     errors = []
-    try:
-        from jinja2 import Environment, FileSystemLoader
-        import weasyprint
+    context = InvoiceContext(invoice_pdf.new_queue(options_map))
+    for entry in entries:
+        if isinstance(entry, data.Custom) and entry.type == "sales-invoice":
+            txn = expand_sales_invoice(entry, errors, context)
+            if txn is not None:
+                new_entries.append(txn)
+        else:
+            new_entries.append(entry)
+    return new_entries, errors
 
-        HAS_PDF_DEPS = True
-    except ImportError:
-        HAS_PDF_DEPS = False
 
-    generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    TEMPLATE_DIR = "templates"
-    OUTPUT_DIR = "bilag/salg"
+# Stages of the plugin chain, in the order __plugins__ runs them. run_pipeline
+# reports errors in this order so its output matches the chain.
+STAGES = ("quick_expense", "auto_fill_expenses", "quick_mileage", "sales_invoice")
 
+
+def build_dispatch_table(stage_errors, vat, context, mileage):
+    """
+    Map Custom directive types to (handler, error list) for one run. Every
+    handler produces a transaction with at least two postings, which
+    auto_fill_expenses would pass through untouched, so a generated
+    transaction never needs to be dispatched a second time. The mileage
+    handlers only queue their trips in mileage and produce nothing.
+    """
+    expense = functools.partial(expand_quick_expense, vat=vat)
+    invoice = functools.partial(expand_sales_invoice, context=context)
+    return {
+        "quick-expense": (expense, stage_errors["quick_expense"]),
+        "u": (expense, stage_errors["quick_expense"]),
+        "quick-mileage": (
+            functools.partial(expand_mileage, context=mileage),
+            stage_errors["quick_mileage"],
+        ),
+        "trip-log": (
+            functools.partial(expand_trip_log, context=mileage),
+            stage_errors["quick_mileage"],
+        ),
+        "sales-invoice": (invoice, stage_errors["sales_invoice"]),
+    }
+
+
+def danish_pipeline(entries, options_map):
+    """
+    Single-pass equivalent of the four plugins in __plugins__, enabled with
+    plugin "plugins.danish_pipeline" instead of plugin "plugins.danish_plugins".
+    It gives the same entries and errors; see benchmarks/bench_pipeline.py for
+    how its speed compares.
+    """
+    new_entries, errors = run_pipeline(
+        entries, InvoiceContext(invoice_pdf.new_queue(options_map))
+    )
+    add_includes(options_map, trip_logs(entries))
+    return new_entries, errors
+
+
+def run_pipeline(entries, invoice_context):
+    """
+    Single-pass equivalent of the four plugins in __plugins__, with the given
+    invoice context. Each entry is routed through a table keyed on its type.
+    plugins.year_cache and plugins.live_ledger use it to process one file at
+    a time.
+    """
+    stage_errors = {stage: [] for stage in STAGES}
+    fill_errors = stage_errors["auto_fill_expenses"]
+    vat = VatEngine()
+    mileage = MileageContext()
+    custom_table = build_dispatch_table(stage_errors, vat, invoice_context, mileage)
+
+    new_entries = []
+    append = new_entries.append
     for entry in entries:
-        if isinstance(entry, data.Custom) and entry.type == "sales-invoice":
-            if len(entry.values) < 4:
-                errors.append(Error(entry.meta, "Expected at least 4 arguments", None))
+        entry_type = type(entry)
+        if entry_type is data.Transaction:
+            append(fill_expense(entry, fill_errors, vat))
+            continue
+        if entry_type is data.Custom:
+            route = custom_table.get(entry.type)
+            if route is not None:
+                handler, handler_errors = route
+                txn = handler(entry, handler_errors)
+                if txn is not None:
+                    append(txn)
                 continue
-            client_name = entry.values[0].value
-            invoice_id = entry.values[1].value
-            income_account = entry.values[2].value
-            line_item_strs = entry.values[3:]
-            items = []
-            total_net = D(0)
-            for item_str in line_item_strs:
-                parts = item_str.value.split(";")
-                if len(parts) != 3:
-                    continue
-                qty, price = D(parts[1]), D(parts[2])
-                line_total = qty * price
-                items.append(
-                    {
-                        "desc": parts[0],
-                        "qty": qty,
-                        "price": price,
-                        "line_total": line_total,
-                    }
-                )
-                total_net += line_total
-            vat_amount = total_net * D("0.25")
-            total_gross = total_net + vat_amount
-            date = entry.date
-            due_date = date + datetime.timedelta(days=14)
-            meta = entry.meta.copy()
-            meta["due_date"] = due_date.isoformat()
-            if HAS_PDF_DEPS:
-                filepath = os.path.join(OUTPUT_DIR, f"{invoice_id}.pdf")
-                meta["filename"] = os.path.abspath(filepath)
-                if not os.path.exists(filepath):
-                    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-                    template = env.get_template("invoice.html")
-                    html_out = template.render(
-                        invoice_id=invoice_id,
-                        date=date.strftime("%Y-%m-%d"),
-                        due_date=due_date.strftime("%Y-%m-%d"),
-                        client_name=client_name,
-                        items=items,
-                        total_net=total_net,
-                        total_vat=vat_amount,
-                        total_gross=total_gross,
-                        metadata={
-                            "generated_at": generation_time,
-                            "generated_by": getpass.getuser(),
-                            "company_name": "Min Virksomhed ApS",
-                            "invoice_id": invoice_id,
-                        },
-                    )
-                    weasyprint.HTML(string=html_out).write_pdf(filepath)
-            postings = [
-                data.Posting(
-                    "Assets:Debitorer",
-                    amount.Amount(total_gross, "DKK"),
-                    None,
-                    None,
-                    None,
-                    None,
-                ),
-                data.Posting(
-                    income_account,
-                    amount.Amount(-total_net, "DKK"),
-                    None,
-                    None,
-                    None,
-                    None,
-                ),
-                data.Posting(
-                    "Liabilities:Moms:Salg",
-                    amount.Amount(-vat_amount, "DKK"),
-                    None,
-                    None,
-                    None,
-                    None,
-                ),
-            ]
-            txn = data.Transaction(
-                meta,
-                date,
-                "*",
-                client_name,
-                f"Invoice {invoice_id}",
-                data.EMPTY_SET,
-                data.EMPTY_SET,
-                postings,
-            )
-            new_entries.append(txn)
-        else:
-            new_entries.append(entry)
+        append(entry)
+    new_entries.extend(mileage_transactions(mileage, stage_errors["quick_mileage"]))
+
+    errors = []
+    for stage in STAGES:
+        errors.extend(stage_errors[stage])
     return new_entries, errors
 
 
-__plugins__ = [quick_expense, auto_fill_expenses, quick_mileage, sales_invoice]
+__plugins__ = instrumentation.instrument_chain(
+    [quick_expense, auto_fill_expenses, quick_mileage, sales_invoice]
+)
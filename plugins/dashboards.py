@@ -0,0 +1,142 @@
+"""
+Precomputed Danish dashboards: VAT per quarter, overdue invoices and this
+year's mileage, the reports behind the queries in queries.beancount.
+
+DashboardCache computes them once per ledger and keeps the result until the
+stat fingerprint (path, mtime, size) of the ledger's source files or the
+current date changes, so showing a dashboard does not walk the entries.
+VAT of closed quarters comes from the moms.SettlementCache on disk, and the
+account balances from a BalanceIndex that is extended, not rebuilt, when a
+reload only added entries at the end.
+"""
+
+import bisect
+import datetime
+import hashlib
+import os
+from collections import namedtuple
+
+from beancount.core import data
+
+from plugins import debitorer
+from plugins import moms
+from plugins.balance_index import BalanceIndex
+from plugins.money import from_ore, to_ore
+
+MILEAGE_ACCOUNT = "Expenses:Personnel:Mileage"
+
+# (label, account prefix) of the balances shown on the dashboard.
+KEY_BALANCES = [
+    ("Bank", "Assets:Bank"),
+    ("Debitorer", debitorer.DEBITOR_ACCOUNT),
+    ("Skyldig moms", "Liabilities:Moms"),
+]
+
+Dashboards = namedtuple(
+    "Dashboards", "as_of moms vat_accounts overdue mileage balances"
+)
+
+# Balance of a KEY_BALANCES account on as_of and at the end of last year.
+KeyBalance = namedtuple("KeyBalance", "label account as_of year_start")
+
+# Payout per month of the current year, with the running total.
+MileageMonth = namedtuple("MileageMonth", "month payout total")
+
+
+def source_fingerprint(filenames):
+    """Stat hash of the ledger's source files."""
+    h = hashlib.sha256()
+    for filename in sorted(filenames):
+        try:
+            st = os.stat(filename)
+            h.update(f"{filename}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+        except OSError:
+            h.update(f"{filename}\0missing\n".encode())
+    return h.hexdigest()
+
+
+def vat_balances(balances, as_of):
+    """Balance on as_of of every VAT account, i.e. with a Moms component."""
+    return {
+        account: number
+        for (account, currency), number in balances.balances(as_of).items()
+        if ":Moms:" in f"{account}:" and currency == "DKK"
+    }
+
+
+def key_balances(balances, as_of):
+    year_end = datetime.date(as_of.year - 1, 12, 31)
+    return [
+        KeyBalance(
+            label,
+            account,
+            balances.total(account, as_of),
+            balances.total(account, year_end),
+        )
+        for label, account in KEY_BALANCES
+    ]
+
+
+def mileage_by_month(entries, year):
+    """MileageMonth rows for the months of year that have mileage payouts."""
+    index = bisect.bisect_left(
+        entries, datetime.date(year, 1, 1), key=lambda entry: entry.date
+    )
+    months = {}
+    for entry in entries[index:]:
+        if entry.date.year != year:
+            break
+        if type(entry) is not data.Transaction:
+            continue
+        for posting in entry.postings:
+            if posting.account == MILEAGE_ACCOUNT:
+                month = entry.date.month
+                months[month] = months.get(month, 0) + to_ore(posting.units.number)
+    rows = []
+    total = 0
+    for month in sorted(months):
+        total += months[month]
+        rows.append(
+            MileageMonth(
+                f"{year}-{month:02d}", from_ore(months[month]), from_ore(total)
+            )
+        )
+    return rows
+
+
+def compute(entries, options_map, as_of, settlement_cache=None, balances=None):
+    """Build the dashboards from sorted, plugin-processed entries."""
+    balances = balances or BalanceIndex(entries)
+    report = debitorer.open_items(entries, as_of)
+    return Dashboards(
+        as_of,
+        moms.settle(entries, "quarter", settlement_cache, as_of),
+        vat_balances(balances, as_of),
+        [item for item in report.items if item.days_overdue > 0],
+        mileage_by_month(entries, as_of.year),
+        key_balances(balances, as_of),
+    )
+
+
+class DashboardCache:
+    """The dashboards of the last ledger seen, keyed on its source files."""
+
+    def __init__(self):
+        self.key = None
+        self.dashboards = None
+        self.balances = BalanceIndex()
+
+    def get(self, entries, options_map, as_of=None):
+        as_of = as_of or datetime.date.today()
+        key = (source_fingerprint(options_map["include"]), as_of)
+        if key != self.key:
+            self.balances.update(entries)
+            self.dashboards = compute(
+                entries,
+                options_map,
+                as_of,
+                moms.SettlementCache(options_map),
+                self.balances,
+            )
+            self.key = key
+        return self.dashboards
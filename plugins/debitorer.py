@@ -0,0 +1,143 @@
+"""
+Open-items index for Assets:Debitorer.
+
+Invoices from sales_invoice carry their invoice id as a link and as
+"invoice" metadata. A payment joins its invoice by using the same id:
+
+    2025-03-20 * "Kunde A/S" "Betaling" ^INV-2025-001
+      Assets:Bank:Erhverv   12125.00 DKK
+      Assets:Debitorer
+
+open_items() collects the Assets:Debitorer postings dated up to as_of,
+hash-joins them on the invoice id and returns the invoices that still have a
+balance, aged by days past their due_date. The ids are gathered before the
+postings are joined, so a payment booked before its invoice still matches.
+Debitor postings without an invoice id are summed as unmatched.
+"""
+
+import datetime
+from collections import namedtuple
+
+from beancount.core import data
+
+from plugins.money import from_ore, to_ore
+
+DEBITOR_ACCOUNT = "Assets:Debitorer"
+
+# (label, highest number of days past due), in order.
+AGING_BUCKETS = [
+    ("ikke forfalden", 0),
+    ("0-14", 14),
+    ("15-30", 30),
+    ("30+", None),
+]
+
+OpenItem = namedtuple(
+    "OpenItem", "invoice_id date due_date client invoiced paid balance days_overdue"
+)
+
+AgingReport = namedtuple("AgingReport", "items buckets unmatched")
+
+
+class _Item:
+    __slots__ = ("date", "due_date", "client", "invoiced", "paid")
+
+    def __init__(self):
+        self.date = None
+        self.due_date = None
+        self.client = None
+        self.invoiced = 0
+        self.paid = 0
+
+
+def invoice_key(entry, invoice_ids):
+    """The invoice id a debitor posting belongs to, or None."""
+    invoice_id = entry.meta.get("invoice")
+    if invoice_id:
+        return invoice_id
+    for link in entry.links:
+        if link in invoice_ids:
+            return link
+    return None
+
+
+def aging_bucket(days_overdue):
+    for label, limit in AGING_BUCKETS:
+        if limit is None or days_overdue <= limit:
+            return label
+
+
+def build_index(entries, as_of=None):
+    """
+    Return ({invoice id: item}, unmatched øre) of the sorted entries dated up
+    to as_of (default all).
+    """
+    rows = []
+    invoice_ids = set()
+    for entry in entries:
+        if as_of is not None and entry.date > as_of:
+            break
+        if type(entry) is not data.Transaction:
+            continue
+        debitor = 0
+        for posting in entry.postings:
+            if posting.account == DEBITOR_ACCOUNT:
+                debitor += to_ore(posting.units.number)
+        if not debitor:
+            continue
+        rows.append((entry, debitor))
+        if entry.meta.get("invoice"):
+            invoice_ids.add(entry.meta["invoice"])
+
+    items = {}
+    unmatched = 0
+    for entry, debitor in rows:
+        key = invoice_key(entry, invoice_ids)
+        if key is None:
+            unmatched += debitor
+            continue
+        item = items.get(key)
+        if item is None:
+            item = items[key] = _Item()
+        if "due_date" in entry.meta:
+            item.date = entry.date
+            item.due_date = datetime.date.fromisoformat(entry.meta["due_date"])
+            item.client = entry.payee
+        if debitor > 0:
+            item.invoiced += debitor
+        else:
+            item.paid -= debitor
+    return items, unmatched
+
+
+def open_items(entries, as_of=None):
+    """Return an AgingReport of unpaid invoices as of a date (default today)."""
+    as_of = as_of or datetime.date.today()
+    items, unmatched = build_index(entries, as_of)
+    buckets = {label: 0 for label, _ in AGING_BUCKETS}
+    result = []
+    for invoice_id, item in items.items():
+        balance = item.invoiced - item.paid
+        if not balance:
+            continue
+        due_date = item.due_date or item.date or as_of
+        days_overdue = (as_of - due_date).days
+        buckets[aging_bucket(days_overdue)] += balance
+        result.append(
+            OpenItem(
+                invoice_id,
+                item.date,
+                item.due_date,
+                item.client,
+                from_ore(item.invoiced),
+                from_ore(item.paid),
+                from_ore(balance),
+                days_overdue,
+            )
+        )
+    result.sort(key=lambda open_item: open_item.days_overdue, reverse=True)
+    return AgingReport(
+        result,
+        {label: from_ore(total) for label, total in buckets.items()},
+        from_ore(unmatched),
+    )
@@ -0,0 +1,177 @@
+"""
+Hash index for finding transactions that were booked twice.
+
+Every transaction is indexed under two kinds of keys:
+
+- (credit account, amount, normalized narration, date), so re-imported bank
+  rows match the rows booked before;
+- (expense account, amount, date bucket) for transactions carrying a
+  YYMMDD-Account link from get_auto_link, so a hand-typed receipt and the
+  same purchase imported from the bank match even when their narrations and
+  dates differ.
+
+Two transactions sharing a key are likely duplicates when they are dated
+within the window of each other, and on the same day if their narrations
+are the same: identical recurring rows, such as the same coffee on two
+days, are not duplicates. The date buckets are window + 1 days wide, so a
+lookup probes the bucket of the date and its two neighbours and only
+touches the entries dated near it, and indexing a ledger is close to linear
+in its size.
+
+An importer uses claim() instead of find(), so every known transaction
+absorbs at most one imported row.
+
+Enable the check on every load with
+
+    plugin "plugins.duplicates" "2"
+
+where the optional config is the window in days.
+"""
+
+import re
+from collections import defaultdict
+
+from beancount.core import data
+
+from plugins.danish_plugins import Error
+from plugins.money import to_ore
+from plugins.vat import VAT_BUY_ACCOUNT, VAT_SELL_ACCOUNT
+
+DEFAULT_WINDOW_DAYS = 2
+
+AUTO_LINK = re.compile(r"^\d{6}-(.+)$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(narration):
+    """Casefold and reduce a narration to space-separated words."""
+    return _NON_WORD.sub(" ", (narration or "").casefold()).strip()
+
+
+def credit_posting(txn):
+    """The bank/creditor posting that pays for the transaction, or None."""
+    for posting in reversed(txn.postings):
+        account = posting.account
+        if (
+            account.startswith(("Assets:", "Liabilities:"))
+            and account != VAT_BUY_ACCOUNT
+            and account != VAT_SELL_ACCOUNT
+            and posting.units is not None
+        ):
+            return posting
+    return None
+
+
+def index_keys(txn, window=DEFAULT_WINDOW_DAYS):
+    """Return the index keys of a transaction (empty if it has no credit)."""
+    credit = credit_posting(txn)
+    if credit is None or credit.units.number is None:
+        return []
+    total = -to_ore(credit.units.number)
+    day = txn.date.toordinal()
+    keys = [("n", credit.account, total, normalize(txn.narration), day)]
+    bucket = day // (window + 1)
+    for link in txn.links:
+        match = AUTO_LINK.match(link)
+        if match:
+            keys.append(("l", match.group(1), total, bucket))
+    return keys
+
+
+def probe_keys(txn, window=DEFAULT_WINDOW_DAYS):
+    """The keys to look txn up under: its own and the neighbouring buckets."""
+    for key in index_keys(txn, window):
+        if key[0] == "l":
+            *prefix, bucket = key
+            for neighbour in (bucket - 1, bucket, bucket + 1):
+                yield (*prefix, neighbour)
+        else:
+            yield key
+
+
+class DuplicateIndex:
+    """Transactions indexed by duplicate key."""
+
+    def __init__(self, entries=(), window_days=DEFAULT_WINDOW_DAYS):
+        self.window = window_days
+        self._index = defaultdict(list)
+        self._claimed = set()
+        for entry in entries:
+            if isinstance(entry, data.Transaction):
+                self.add(entry)
+
+    def add(self, txn):
+        narration = normalize(txn.narration)
+        for key in index_keys(txn, self.window):
+            self._index[key].append((txn, narration))
+
+    def find(self, txn):
+        """Return the indexed transactions txn is a likely duplicate of."""
+        found = []
+        seen = {id(txn)}
+        narration = normalize(txn.narration)
+        for key in probe_keys(txn, self.window):
+            for other, other_narration in self._index.get(key, ()):
+                days = abs((other.date - txn.date).days)
+                if (
+                    id(other) not in seen
+                    and days <= self.window
+                    and (days == 0 or other_narration != narration)
+                ):
+                    seen.add(id(other))
+                    found.append(other)
+        return found
+
+    def contains(self, txn):
+        return bool(self.find(txn))
+
+    def claim(self, txn):
+        """
+        Return the unclaimed indexed transaction closest in date to txn that
+        it duplicates, and mark it claimed, or return None.
+        """
+        candidates = [
+            other for other in self.find(txn) if id(other) not in self._claimed
+        ]
+        if not candidates:
+            return None
+        other = min(candidates, key=lambda other: abs((other.date - txn.date).days))
+        self._claimed.add(id(other))
+        return other
+
+
+def find_duplicates(entries, window_days=DEFAULT_WINDOW_DAYS):
+    """
+    Return (entry, earlier duplicates) pairs for every transaction that
+    duplicates one seen before it.
+    """
+    index = DuplicateIndex(window_days=window_days)
+    pairs = []
+    for entry in entries:
+        if not isinstance(entry, data.Transaction):
+            continue
+        matches = index.find(entry)
+        if matches:
+            pairs.append((entry, matches))
+        index.add(entry)
+    return pairs
+
+
+def location(entry):
+    return f"{entry.meta.get('filename', '?')}:{entry.meta.get('lineno', '?')}"
+
+
+def check_duplicates(entries, options_map, config=None):
+    window = int(config) if config else DEFAULT_WINDOW_DAYS
+    errors = []
+    for entry, matches in find_duplicates(entries, window):
+        others = ", ".join(location(other) for other in matches)
+        errors.append(
+            Error(
+                entry.meta, f"Possible duplicate of {others}: {entry.narration}", entry
+            )
+        )
+    return entries, errors
+
+
+__plugins__ = [check_duplicates]
@@ -0,0 +1,33 @@
+"""
+Fava extension showing the precomputed Danish dashboards. Enable it in
+regnskab.beancount with
+
+    1900-01-01 custom "fava-extension" "plugins.fava_dashboards"
+
+The dashboards are computed right after Fava (re)loads the ledger and then
+served from plugins.dashboards.DashboardCache on every page view.
+"""
+
+from fava.ext import FavaExtensionBase
+
+from plugins import dashboards
+
+
+class DanishDashboards(FavaExtensionBase):
+    report_title = "Danske dashboards"
+
+    def __init__(self, ledger, config=None):
+        super().__init__(ledger, config)
+        self.cache = dashboards.DashboardCache()
+
+    def after_load_file(self):
+        self.dashboards()
+
+    def dashboards(self):
+        return self.cache.get(self.ledger.all_entries, self.ledger.options)
+
+    @staticmethod
+    def bar_width(value, values):
+        """Width in percent of a bar for value, relative to the largest."""
+        largest = max((abs(v) for v in values), default=0)
+        return 0 if not largest else round(abs(value) / largest * 100, 1)
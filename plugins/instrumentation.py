@@ -0,0 +1,133 @@
+"""
+Opt-in timing and counters for the Danish plugins.
+
+Switch it on with the environment variable or the plugin configuration:
+
+    DANISH_PLUGIN_STATS=1 bean-check regnskab.beancount
+    DANISH_PLUGIN_STATS=stats.json fava regnskab.beancount
+    plugin "plugins.danish_plugins" "stats=stats.json"
+
+"1" (or "stats") prints a summary to stderr after each load; a path also
+writes the same figures as JSON for monitoring. When it is off, the only cost
+is one check per plugin call.
+"""
+
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+
+ENV_VAR = "DANISH_PLUGIN_STATS"
+
+FIELDS = ("wall_s", "entries_in", "entries_out", "transformed", "errors", "render_s")
+
+
+def parse_setting(value):
+    """
+    Return (enabled, json_path) for an env var or plugin config value such as
+    "1", "stats" or "stats=out.json".
+    """
+    if not value:
+        return False, None
+    value = value.strip()
+    if value.startswith("stats="):
+        return True, value[len("stats=") :]
+    if value in ("1", "true", "yes", "stats"):
+        return True, None
+    if value.endswith(".json"):
+        return True, value
+    return False, None
+
+
+class Run:
+    """Figures collected for one ledger load."""
+
+    def __init__(self, ledger=None):
+        self.ledger = ledger
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self.records = []
+
+    def record(self, plugin, **figures):
+        row = {"plugin": plugin}
+        for field in FIELDS:
+            row[field] = figures.get(field, 0)
+        self.records.append(row)
+        return row
+
+    def as_dict(self):
+        return {
+            "ledger": self.ledger,
+            "started_at": self.started_at,
+            "total_s": round(sum(row["wall_s"] for row in self.records), 6),
+            "plugins": self.records,
+        }
+
+    def summary(self):
+        lines = [f"Danish plugin stats for {self.ledger or '<unknown>'}:"]
+        lines.append(
+            f"  {'plugin':<20} {'wall_s':>9} {'in':>8} {'out':>8} "
+            f"{'transf.':>8} {'errors':>7} {'render_s':>9}"
+        )
+        for row in self.records:
+            lines.append(
+                f"  {row['plugin']:<20} {row['wall_s']:>9.4f} {row['entries_in']:>8} "
+                f"{row['entries_out']:>8} {row['transformed']:>8} "
+                f"{row['errors']:>7} {row['render_s']:>9.4f}"
+            )
+        return "\n".join(lines)
+
+    def emit(self, json_path=None, stream=None):
+        print(self.summary(), file=stream or sys.stderr)
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(self.as_dict(), f, indent=1)
+
+
+# The load currently being instrumented in this process.
+current = None
+
+
+def instrument_chain(functions):
+    """
+    Wrap the plugin functions of one module. The first function starts a new
+    run and the last one emits the report, so a report covers exactly one load.
+    The plugin configuration is consumed by the wrapper.
+    """
+    wrapped = []
+    last = len(functions) - 1
+    for index, func in enumerate(functions):
+        wrapped.append(_wrap(func, first=index == 0, final=index == last))
+    return wrapped
+
+
+def _wrap(func, first, final):
+    @functools.wraps(func)
+    def wrapper(entries, options_map, config=None):
+        global current
+        enabled, json_path = parse_setting(config)
+        if not enabled:
+            enabled, json_path = parse_setting(os.environ.get(ENV_VAR))
+        if not enabled:
+            return func(entries, options_map)
+
+        if first or current is None:
+            current = Run(options_map.get("filename"))
+        seen = set(map(id, entries))
+        t0 = time.perf_counter()
+        new_entries, errors = func(entries, options_map)
+        elapsed = time.perf_counter() - t0
+        current.record(
+            func.__name__,
+            wall_s=round(elapsed, 6),
+            entries_in=len(entries),
+            entries_out=len(new_entries),
+            transformed=sum(1 for entry in new_entries if id(entry) not in seen),
+            errors=len(errors),
+        )
+        if final:
+            current.emit(json_path)
+        return new_entries, errors
+
+    return wrapper
@@ -0,0 +1,188 @@
+"""
+Out-of-band PDF rendering for sales invoices.
+
+The sales_invoice plugin never renders. It records where each invoice PDF is
+expected and queues a job for every PDF that is missing or out of date. The
+queue belongs to the load: it is kept in that load's options_map, so
+concurrent loads in one process (Fava, the ledger daemon, the batch runner)
+never see each other's jobs. render_invoices.py loads the ledger and renders
+pending(options_map) with a process pool.
+
+Only the queueing side is imported during a ledger load. jinja2, weasyprint
+and the process pool are imported when rendering actually starts.
+
+An invoice is out of date when the hash of its rendered inputs (client, lines,
+totals and the template mtime) differs from the one stored in the manifest
+when its PDF was last rendered.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+TEMPLATE_DIR = "templates"
+TEMPLATE_NAME = "invoice.html"
+OUTPUT_DIR = "bilag/salg"
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, ".manifest")
+COMPANY_NAME = "Min Virksomhed ApS"
+COMPANY_CVR = "12345678"  # As printed by templates/invoice.html
+
+InvoiceJob = namedtuple(
+    "InvoiceJob",
+    "filepath invoice_id date due_date client_name items total_net total_vat total_gross digest",
+)
+
+# The options_map key holding the jobs queued by a load.
+JOBS_OPTION = "invoice_jobs"
+
+
+def new_queue(options_map):
+    """Start an empty queue in the options_map of a load and return it."""
+    queue = options_map[JOBS_OPTION] = []
+    return queue
+
+
+def pending(options_map):
+    """The jobs queued by the load that returned options_map."""
+    return options_map.get(JOBS_OPTION, [])
+
+
+def invoice_path(invoice_id):
+    return os.path.join(OUTPUT_DIR, f"{invoice_id}.pdf")
+
+
+def template_mtime():
+    """Return the invoice template mtime, or None if it does not exist."""
+    try:
+        return os.stat(os.path.join(TEMPLATE_DIR, TEMPLATE_NAME)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def input_digest(
+    invoice_id, date, due_date, client_name, items, totals, template_version
+):
+    """Hash everything that ends up in the rendered PDF."""
+    payload = [
+        invoice_id,
+        date.isoformat(),
+        due_date.isoformat(),
+        client_name,
+        [
+            [
+                item["desc"],
+                str(item["qty"]),
+                str(item["price"]),
+                str(item["line_total"]),
+            ]
+            for item in items
+        ],
+        [str(total) for total in totals],
+        template_version,
+    ]
+    encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return the {invoice_id: digest} map of rendered invoices."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def needs_render(job, manifest):
+    return manifest.get(job.invoice_id) != job.digest or not os.path.exists(
+        job.filepath
+    )
+
+
+_template = None
+
+
+def _load_template():
+    """Build the Jinja environment and compile the invoice template."""
+    global _template
+    from jinja2 import Environment, FileSystemLoader
+
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    _template = env.get_template(TEMPLATE_NAME)
+
+
+def _get_template():
+    if _template is None:
+        _load_template()
+    return _template
+
+
+def render_invoice(job, generation_time):
+    """Render a single invoice job to its PDF file. Returns the render time."""
+    import getpass
+    import weasyprint
+
+    t0 = time.perf_counter()
+    html_out = _get_template().render(
+        invoice_id=job.invoice_id,
+        date=job.date.strftime("%Y-%m-%d"),
+        due_date=job.due_date.strftime("%Y-%m-%d"),
+        client_name=job.client_name,
+        items=job.items,
+        total_net=job.total_net,
+        total_vat=job.total_vat,
+        total_gross=job.total_gross,
+        metadata={
+            "generated_at": generation_time,
+            "generated_by": getpass.getuser(),
+            "company_name": COMPANY_NAME,
+            "invoice_id": job.invoice_id,
+        },
+    )
+    os.makedirs(os.path.dirname(job.filepath) or ".", exist_ok=True)
+    weasyprint.HTML(string=html_out).write_pdf(job.filepath)
+    return time.perf_counter() - t0
+
+
+def render_all(jobs, workers=None, manifest_path=MANIFEST_PATH):
+    """
+    Render jobs in a process pool. Each worker compiles the template once.
+    Yields (job, error, render_s) as each one finishes; error is None on
+    success. The manifest is updated for every invoice that rendered
+    successfully.
+    """
+    if not jobs:
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    manifest = load_manifest(manifest_path)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_load_template
+        ) as pool:
+            futures = {
+                pool.submit(render_invoice, job, generation_time): job for job in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    render_s = future.result()
+                except Exception as exc:
+                    yield job, exc, 0
+                else:
+                    manifest[job.invoice_id] = job.digest
+                    yield job, None, render_s
+    finally:
+        save_manifest(manifest, manifest_path)
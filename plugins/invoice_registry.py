@@ -0,0 +1,167 @@
+"""
+Registry of the issued sales invoices, keyed by invoice id.
+
+An issued invoice is a transaction with "invoice" metadata that debits
+Assets:Debitorer, as sales_invoice produces. The registry is built in one
+pass over the sorted entries and maps every invoice id to its entry, across
+all loaded years. The unpaid invoices the opening balances of a closed year
+carry forward are registered too, so their ids cannot be reused, but they
+are left out of the numbering checks: the rest of their series is archived.
+
+Ids are split into a series and a number at their trailing digits, so
+INV-2025-007 is number 7 of series INV-2025-. Within a series the registry
+finds
+
+- duplicates: an id used by more than one invoice,
+- numbers that go backwards: an invoice numbered below the one before it,
+- gaps: numbers missing between the lowest and highest number of the series.
+
+Enable the checks on every load with
+
+    plugin "plugins.invoice_registry"
+"""
+
+import re
+from collections import namedtuple
+
+from beancount.core import data
+
+from plugins import closing
+from plugins import debitorer
+from plugins.danish_plugins import Error
+from plugins.duplicates import location
+
+_TRAILING_NUMBER = re.compile(r"^(.*?)(\d+)$")
+
+Invoice = namedtuple("Invoice", "invoice_id series number entry")
+
+
+def split_id(invoice_id):
+    """(series, number) of an invoice id; number is None without digits."""
+    match = _TRAILING_NUMBER.match(invoice_id)
+    if match is None:
+        return invoice_id, None
+    return match.group(1), int(match.group(2))
+
+
+def format_id(series, number, width):
+    return f"{series}{number:0{width}d}"
+
+
+def is_issued(entry):
+    """True for a transaction that issues the invoice in its metadata."""
+    if type(entry) is not data.Transaction or not entry.meta.get("invoice"):
+        return False
+    return any(
+        posting.account == debitorer.DEBITOR_ACCOUNT
+        and posting.units is not None
+        and posting.units.number > 0
+        for posting in entry.postings
+    )
+
+
+def is_carried_forward(entry):
+    return any(posting.account == closing.OPENING_ACCOUNT for posting in entry.postings)
+
+
+class InvoiceRegistry:
+    """The issued invoices of a ledger with their numbering problems."""
+
+    def __init__(self, entries=()):
+        self.invoices = {}
+        # {series: {number: invoice id}} and the zero-padded width of each.
+        self.numbers = {}
+        self.widths = {}
+        self.last = {}
+        self.duplicates = []
+        self.duplicated_ids = set()
+        self.out_of_order = []
+        for entry in entries:
+            if is_issued(entry):
+                self.add(entry)
+
+    def add(self, entry):
+        """Register an issued invoice; entries must come in date order."""
+        invoice_id = entry.meta["invoice"]
+        series, number = split_id(invoice_id)
+        first = self.invoices.get(invoice_id)
+        if first is not None:
+            self.duplicates.append((first, entry))
+            self.duplicated_ids.add(invoice_id)
+            return
+        self.invoices[invoice_id] = Invoice(invoice_id, series, number, entry)
+        if number is None or is_carried_forward(entry):
+            return
+        self.numbers.setdefault(series, {})[number] = invoice_id
+        width = len(invoice_id) - len(series)
+        self.widths[series] = min(width, self.widths.get(series, width))
+        # Same-day invoices may come in any order, so only a later date
+        # with a lower number than the previous invoice is a step back.
+        last = self.last.get(series)
+        if last is not None and number < last.number and entry.date > last.entry.date:
+            self.out_of_order.append((last, entry))
+        self.last[series] = self.invoices[invoice_id]
+
+    def get(self, invoice_id):
+        """The Invoice with the given id, or None."""
+        return self.invoices.get(invoice_id)
+
+    def __contains__(self, invoice_id):
+        return invoice_id in self.invoices
+
+    def __len__(self):
+        return len(self.invoices)
+
+    def is_duplicated(self, invoice_id):
+        return invoice_id in self.duplicated_ids
+
+    def gaps(self):
+        """{series: [missing invoice ids]} for the series with gaps."""
+        gaps = {}
+        for series, numbers in sorted(self.numbers.items()):
+            missing = [
+                format_id(series, number, self.widths[series])
+                for number in range(min(numbers), max(numbers))
+                if number not in numbers
+            ]
+            if missing:
+                gaps[series] = missing
+        return gaps
+
+    def errors(self):
+        errors = []
+        for first, entry in self.duplicates:
+            errors.append(
+                Error(
+                    entry.meta,
+                    f"Invoice id {first.invoice_id} already used at "
+                    f"{location(first.entry)}",
+                    entry,
+                )
+            )
+        for last, entry in self.out_of_order:
+            errors.append(
+                Error(
+                    entry.meta,
+                    f"Invoice {entry.meta['invoice']} is numbered before "
+                    f"{last.invoice_id} of {last.entry.date}",
+                    entry,
+                )
+            )
+        for series, missing in self.gaps().items():
+            last = self.last[series]
+            errors.append(
+                Error(
+                    last.entry.meta,
+                    f"Missing invoice numbers in series {series}: {', '.join(missing)}",
+                    None,
+                )
+            )
+        return errors
+
+
+def check_invoice_numbers(entries, options_map):
+    return entries, InvoiceRegistry(entries).errors()
+
+
+__plugins__ = [check_invoice_numbers]
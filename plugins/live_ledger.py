@@ -0,0 +1,213 @@
+"""
+A ledger kept in memory and refreshed one include file at a time.
+
+The main file is parsed for its options, plugins and includes. Every file it
+includes is parsed, booked and run through the Danish plugins on its own, the
+same way plugins.year_cache processes closed years, and the result is kept
+per file together with its mtime and size and those of the trip-log CSV
+files it reads. refresh() re-stats the files, re-expands the include globs
+and processes only the files that changed. The
+remaining plugins (the ones declared besides the Danish plugins plus
+Beancount's own) and validation then run on the combined entries, which is
+much cheaper than parsing and processing the whole ledger again. Transaction
+balancing is checked per file, as it does not depend on other files.
+
+balance_index() returns a BalanceIndex of the combined entries. It is
+brought up to date when asked for, and only extended when a refresh just
+added entries at the end, e.g. new bookings in the current year.
+
+A change to the main file itself reloads everything. Booking runs per file,
+so a file cannot reduce lots opened in another file.
+"""
+
+import glob
+import os
+
+from beancount import loader
+from beancount.core import data
+from beancount.core import display_context
+from beancount.ops import validation
+from beancount.parser import booking
+from beancount.parser import parser
+
+from plugins import danish_plugins
+from plugins.balance_index import BalanceIndex
+
+# Plugins that run per include file instead of on the combined ledger.
+PER_FILE_PLUGINS = ("plugins.danish_plugins", "plugins.danish_pipeline")
+
+
+def file_stamp(filename):
+    """(mtime_ns, size) of filename, or None if it is missing."""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def trip_log_stamps(entries):
+    """{trip log: stamp} of the trip-log CSV files read by entries."""
+    return {name: file_stamp(name) for name in danish_plugins.trip_logs(entries)}
+
+
+def expand_includes(filename, includes, errors):
+    """Absolute file names matched by the include globs of filename."""
+    cwd = os.path.dirname(filename)
+    found = []
+    for pattern in includes:
+        matched = glob.glob(os.path.join(cwd, pattern), recursive=True)
+        if not matched:
+            errors.append(
+                loader.LoadError(
+                    data.new_metadata("<load>", 0),
+                    f'File glob "{pattern}" does not match any files',
+                )
+            )
+        found.extend(os.path.normpath(name) for name in matched)
+    return found
+
+
+def process_entries(entries, errors, options_map, per_file_plugins):
+    """Book entries and, if configured, run the Danish plugins on them."""
+    entries, booking_errors = booking.book(entries, options_map)
+    errors.extend(booking_errors)
+    if per_file_plugins:
+        # The daemon never renders invoice PDFs.
+        entries, plugin_errors = danish_plugins.run_pipeline(
+            entries, danish_plugins.InvoiceContext(pending=[])
+        )
+        errors.extend(plugin_errors)
+    # Balancing is a per-transaction check, so it is done once per file
+    # instead of on every rebuild of the combined ledger.
+    errors.extend(validation.validate_check_transaction_balances(entries, options_map))
+    return entries, errors
+
+
+class SourceFile:
+    """The processed entries of one include file."""
+
+    def __init__(self, filename, options_map, per_file_plugins):
+        self.filename = filename
+        self.stamp = file_stamp(filename)
+        entries, errors, self.options_map = parser.parse_file(filename)
+        self.includes = self.options_map["include"]
+        self.trip_logs = trip_log_stamps(entries)
+        self.entries, self.errors = process_entries(
+            entries, errors, options_map, per_file_plugins
+        )
+
+    def changed(self):
+        """True if the file or one of its trip logs changed on disk."""
+        return self.stamp != file_stamp(self.filename) or any(
+            file_stamp(name) != stamp for name, stamp in self.trip_logs.items()
+        )
+
+
+class LiveLedger:
+    """
+    The plugin-processed entries, errors and options of a ledger, updated by
+    refresh(). Callers serialize access; the object holds no lock.
+    """
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self.entries = []
+        self.errors = []
+        self.options_map = None
+        self.sources = {}
+        self.balances = BalanceIndex()
+        self.reload()
+
+    def reload(self):
+        """Discard all processed files and load the ledger from scratch."""
+        self.stamp = file_stamp(self.filename)
+        entries, errors, options_map = parser.parse_file(self.filename)
+        options_map["filename"] = self.filename
+        self.trip_logs = trip_log_stamps(entries)
+        self.per_file = any(
+            name in PER_FILE_PLUGINS for name, _ in options_map["plugin"]
+        )
+        self.includes = options_map["include"]
+        self.main_options = options_map
+        self.main_entries, self.main_errors = process_entries(
+            entries, errors, options_map, self.per_file
+        )
+        self.sources = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-process the include files that changed since the last call and
+        rebuild the combined ledger. Returns the list of re-processed file
+        names, empty if nothing changed.
+        """
+        if file_stamp(self.filename) != self.stamp or any(
+            file_stamp(name) != stamp for name, stamp in self.trip_logs.items()
+        ):
+            self.reload()
+            return [self.filename, *self.sources]
+
+        include_errors = []
+        pending = [(self.filename, self.includes)]
+        sources = {}
+        changed = []
+        while pending:
+            parent, includes = pending.pop(0)
+            for filename in expand_includes(parent, includes, include_errors):
+                if filename in sources or filename == self.filename:
+                    continue
+                source = self.sources.get(filename)
+                if source is None or source.changed():
+                    source = SourceFile(filename, self.main_options, self.per_file)
+                    changed.append(filename)
+                sources[filename] = source
+                pending.append((filename, source.includes))
+
+        if self.options_map is not None and not changed:
+            if sources.keys() == self.sources.keys():
+                return []
+        self.sources = sources
+        self.combine(include_errors)
+        return changed or sorted(sources)
+
+    def combine(self, include_errors):
+        """Run the global plugins and validation on all processed files."""
+        entries = list(self.main_entries)
+        errors = [*self.main_errors, *include_errors]
+        for source in self.sources.values():
+            entries.extend(source.entries)
+            errors.extend(source.errors)
+        entries.sort(key=data.entry_sortkey)
+
+        options_map = dict(self.main_options)
+        options_map["dcontext"] = display_context.DisplayContext()
+        options_map["dcontext"].update_from(self.main_options["dcontext"])
+        options_map = loader.aggregate_options_map(
+            options_map, [source.options_map for source in self.sources.values()]
+        )
+        options_map["include"] = sorted([self.filename, *self.sources])
+        options_map["plugin"] = [
+            (name, config)
+            for name, config in self.main_options["plugin"]
+            if name not in PER_FILE_PLUGINS
+        ]
+        checked = {id(entry) for entry in entries}
+        entries, errors = loader.run_transformations(entries, errors, options_map, None)
+        for validate in validation.VALIDATIONS:
+            if validate is validation.validate_check_transaction_balances:
+                # Only the entries the global plugins added or changed.
+                added = [entry for entry in entries if id(entry) not in checked]
+                errors.extend(validate(added, options_map))
+            else:
+                errors.extend(validate(entries, options_map))
+        # Report the plugins as declared.
+        options_map["plugin"] = self.main_options["plugin"]
+        self.entries = entries
+        self.errors = errors
+        self.options_map = options_map
+
+    def balance_index(self):
+        """The BalanceIndex of the current entries."""
+        self.balances.update(self.entries)
+        return self.balances
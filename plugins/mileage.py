@@ -0,0 +1,83 @@
+"""
+Statens takster for kørselsgodtgørelse and the per-year kilometre count
+that decides which tier a trip is paid at.
+
+Each rate period starts on valid_from and runs until the next one; the last
+one runs until RATES_VALID_UNTIL, after which no rate applies. The high rate
+covers the first TIER_LIMIT_KM kilometres driven in a calendar year,
+everything beyond that is paid at the low rate. Update the table and
+RATES_VALID_UNTIL from skat.dk when new rates are published.
+
+A plugin run queues every trip in a MileageContext first and only then
+pays them out in date order, so the tier of a trip depends on the
+kilometres driven before it, whether they come from quick-mileage entries
+or trip logs.
+"""
+
+import bisect
+import datetime
+import decimal
+from collections import namedtuple
+
+D = decimal.Decimal
+
+TIER_LIMIT_KM = D(20000)
+
+MileageRate = namedtuple("MileageRate", "valid_from rate rate_above")
+
+# meta, date and km of a trip, the purpose shown in the narration and, for
+# trips paid out per month, the key of their month.
+Trip = namedtuple("Trip", "meta date km purpose month")
+
+MILEAGE_RATES = [
+    MileageRate(datetime.date(2025, 1, 1), D("3.80"), D("2.23")),
+    MileageRate(datetime.date(2026, 1, 1), D("3.82"), D("2.23")),
+]
+
+# The last day the published rates cover.
+RATES_VALID_UNTIL = datetime.date(2026, 12, 31)
+
+_starts = [period.valid_from for period in MILEAGE_RATES]
+
+
+def find_rate(date):
+    """The rate period in force on date, or None outside the table."""
+    if date > RATES_VALID_UNTIL:
+        return None
+    index = bisect.bisect_right(_starts, date) - 1
+    return MILEAGE_RATES[index] if index >= 0 else None
+
+
+class MileageContext:
+    """The trips of one plugin run and the kilometres paid out per year."""
+
+    def __init__(self):
+        self.trips = []
+        self.km_by_year = {}
+
+    def add(self, meta, date, km, purpose=None, month=None):
+        """Queue a trip to be paid out by legs() in date order."""
+        self.trips.append(Trip(meta, date, km, purpose, month))
+
+    def trips_by_date(self):
+        """The queued trips by date, in the order queued within a day."""
+        return sorted(self.trips, key=lambda trip: trip.date)
+
+    def legs(self, date, km):
+        """
+        Split a trip of km kilometres driven on date into (km, rate) legs and
+        count it towards the year. A trip crossing TIER_LIMIT_KM gets one
+        leg at each rate. Returns None if no rate applies on date.
+        """
+        period = find_rate(date)
+        if period is None:
+            return None
+        driven = self.km_by_year.get(date.year, 0)
+        self.km_by_year[date.year] = driven + km
+        below = min(km, max(TIER_LIMIT_KM - driven, 0))
+        legs = []
+        if below:
+            legs.append((below, period.rate))
+        if km - below:
+            legs.append((km - below, period.rate_above))
+        return legs or [(km, period.rate)]
@@ -0,0 +1,214 @@
+"""
+VAT settlement (momsafregning) per period.
+
+settle() walks the transactions once and adds every posting to the VAT
+accounts into a bucket for its settlement period (month, quarter or half
+year). Each bucket gives the fields of the momsangivelse:
+
+- salgsmoms: output VAT on sales
+- koebsmoms: deductible input VAT
+- moms_udland: VAT self-assessed on purchases abroad (u-moms)
+- rubrik_a: value of purchases abroad (u-moms)
+- afgift: the amount payable, salgsmoms + moms_udland - koebsmoms
+
+Only transactions that also post to Income or Expenses count, so opening
+balances and the settlement payments themselves are left out.
+
+With a SettlementCache, closed periods whose source files and plugin sources
+(plugins.year_cache.plugin_version() and this module) are unchanged are read
+from .ledger-cache/moms.json and the entries are only scanned from the
+first period that needs recomputing, normally the open one.
+"""
+
+import bisect
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+
+from beancount.core import data
+
+from plugins import year_cache
+from plugins.money import from_ore, to_ore
+from plugins.vat import VAT_BUY_ACCOUNT, VAT_SELL_ACCOUNT
+
+FIELDS = ("salgsmoms", "koebsmoms", "moms_udland", "rubrik_a")
+
+Settlement = namedtuple(
+    "Settlement", "period start end salgsmoms koebsmoms moms_udland rubrik_a afgift"
+)
+
+# Period length in months.
+PERIODS = {"month": 1, "quarter": 3, "half": 6}
+
+CACHE_PATH = os.path.join(".ledger-cache", "moms.json")
+
+_YEAR_DIR = re.compile(r"^\d{4}$")
+
+_settlement_version = None
+
+
+def settlement_version():
+    """Hash of the plugin sources that shape the settled figures."""
+    global _settlement_version
+    if _settlement_version is None:
+        digest = hashlib.sha256(year_cache.plugin_version().encode())
+        with open(os.path.abspath(__file__), "rb") as f:
+            digest.update(f.read())
+        _settlement_version = digest.hexdigest()
+    return _settlement_version
+
+
+def period_start(date, months):
+    return datetime.date(date.year, (date.month - 1) // months * months + 1, 1)
+
+
+def next_period(start, months):
+    month = start.month - 1 + months
+    return datetime.date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def period_label(start, months):
+    if months == 1:
+        return f"{start.year}-{start.month:02d}"
+    index = (start.month - 1) // months + 1
+    return f"{start.year}-{'Q' if months == 3 else 'H'}{index}"
+
+
+def accumulate(entries, months, buckets):
+    """Add the VAT postings of entries to buckets in one pass."""
+    for entry in entries:
+        if type(entry) is not data.Transaction:
+            continue
+        vat_buy = vat_sell = expense = 0
+        has_vat = has_pl = False
+        for posting in entry.postings:
+            account = posting.account
+            if account == VAT_BUY_ACCOUNT:
+                vat_buy += to_ore(posting.units.number)
+                has_vat = True
+            elif account == VAT_SELL_ACCOUNT:
+                vat_sell -= to_ore(posting.units.number)
+                has_vat = True
+            elif account.startswith("Expenses:"):
+                expense += to_ore(posting.units.number)
+                has_pl = True
+            elif account.startswith("Income:"):
+                has_pl = True
+        if not (has_vat and has_pl):
+            continue
+        start = period_start(entry.date, months)
+        bucket = buckets.get(start)
+        if bucket is None:
+            bucket = buckets[start] = dict.fromkeys(FIELDS, 0)
+        bucket["koebsmoms"] += vat_buy
+        if vat_buy and vat_sell and expense:
+            # Reverse charge: the salgsmoms is self-assessed on a purchase.
+            bucket["moms_udland"] += vat_sell
+            bucket["rubrik_a"] += expense
+        else:
+            bucket["salgsmoms"] += vat_sell
+
+
+def make_settlement(start, months, bucket):
+    amounts = {field: from_ore(bucket[field]) for field in FIELDS}
+    afgift = from_ore(bucket["salgsmoms"] + bucket["moms_udland"] - bucket["koebsmoms"])
+    end = next_period(start, months) - datetime.timedelta(days=1)
+    return Settlement(period_label(start, months), start, end, afgift=afgift, **amounts)
+
+
+class SettlementCache:
+    """Settled figures of closed periods, stored next to the ledger."""
+
+    def __init__(self, options_map, path=None):
+        self.root = os.path.dirname(options_map["filename"])
+        self.path = path or os.path.join(self.root, CACHE_PATH)
+        self.includes = list(options_map.get("include", []))
+        self._fingerprints = {}
+        try:
+            with open(self.path) as f:
+                self.periods = json.load(f)
+        except (OSError, ValueError):
+            self.periods = {}
+
+    def fingerprint(self, year):
+        """
+        Stat hash of the files that can hold entries of a year, mixed with
+        settlement_version().
+        """
+        if year not in self._fingerprints:
+            files = set(glob.glob(os.path.join(self.root, str(year), "*.beancount")))
+            for filename in self.includes:
+                folder = os.path.basename(os.path.dirname(filename))
+                if folder == str(year) or not _YEAR_DIR.match(folder):
+                    files.add(filename)
+            h = hashlib.sha256(settlement_version().encode())
+            for filename in sorted(files):
+                try:
+                    st = os.stat(filename)
+                    h.update(f"{filename}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+                except OSError:
+                    h.update(f"{filename}\0missing\n".encode())
+            self._fingerprints[year] = h.hexdigest()
+        return self._fingerprints[year]
+
+    def get(self, label, year):
+        record = self.periods.get(label)
+        if record and record["fingerprint"] == self.fingerprint(year):
+            return record["fields"]
+        return None
+
+    def put(self, label, year, bucket):
+        self.periods[label] = {"fingerprint": self.fingerprint(year), "fields": bucket}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.periods, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def settle(entries, period="quarter", cache=None, as_of=None):
+    """
+    Return a Settlement per period that has VAT postings, in date order.
+    entries must be sorted by date, as the loader returns them.
+    """
+    months = PERIODS[period]
+    open_start = period_start(as_of or datetime.date.today(), months)
+    first = next((e.date for e in entries if isinstance(e, data.Transaction)), None)
+    if first is None:
+        return []
+
+    # Reuse cached closed periods up to the first one that is missing or stale.
+    buckets = {}
+    scan_from = period_start(first, months)
+    if cache is not None:
+        start = scan_from
+        while start < open_start:
+            label = f"{period}:{period_label(start, months)}"
+            cached = cache.get(label, start.year)
+            if cached is None:
+                break
+            if any(cached.values()):
+                buckets[start] = cached
+            start = next_period(start, months)
+        scan_from = start
+
+    index = bisect.bisect_left(entries, scan_from, key=lambda entry: entry.date)
+    scanned = {}
+    accumulate(entries[index:], months, scanned)
+    buckets.update(scanned)
+
+    if cache is not None:
+        start = scan_from
+        while start < open_start:
+            label = f"{period}:{period_label(start, months)}"
+            cache.put(label, start.year, scanned.get(start, dict.fromkeys(FIELDS, 0)))
+            start = next_period(start, months)
+        cache.save()
+
+    return [make_settlement(start, months, buckets[start]) for start in sorted(buckets)]
@@ -0,0 +1,42 @@
+"""
+Fixed-point money arithmetic in integer øre.
+
+Amounts are converted to whole øre once, all VAT arithmetic is done on
+integers, and results are converted back to Decimals with exactly two
+places. Every division rounds half away from zero (ROUNDING), so a split
+of a total into parts always adds up to the total exactly.
+"""
+
+import decimal
+
+D = decimal.Decimal
+ROUNDING = decimal.ROUND_HALF_UP
+ORE_PER_UNIT = 100
+
+
+def to_ore(number):
+    """Convert a Decimal amount to integer øre, rounding by ROUNDING."""
+    return int((number * ORE_PER_UNIT).to_integral_value(rounding=ROUNDING))
+
+
+def from_ore(ore):
+    """Convert integer øre to a Decimal with two places."""
+    return D(ore).scaleb(-2)
+
+
+def round_money(number):
+    """Round a Decimal amount to øre by ROUNDING."""
+    return from_ore(to_ore(number))
+
+
+def div_round(numerator, denominator):
+    """Divide integers, rounding half away from zero. denominator must be > 0."""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def ratio(number):
+    """Return a Decimal rate such as 0.25 as an integer (numerator, denominator)."""
+    return D(number).as_integer_ratio()
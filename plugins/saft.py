@@ -0,0 +1,336 @@
+"""
+SAF-T Financial (DK) export.
+
+write_saft() streams the audit file through xml.sax.saxutils.XMLGenerator,
+so only the current transaction is held while writing. The totals and
+balances the header and master files need before the journal are computed
+in a first pass over the entries:
+
+- GeneralLedgerAccounts from the open directives of kontoplan.beancount,
+  with opening and closing balances for the selection period. An Open
+  directive may carry "description" and "standard_account" (the account in
+  Erhvervsstyrelsen's standardkontoplan) metadata. Income and expense
+  accounts start from zero at the start of the fiscal year; the result of
+  earlier years is carried on Equity:Opening-Balances, as plugins.closing
+  does when it closes a year.
+- Customers from the invoices of plugins.debitorer, with the balance of
+  every Assets:Debitorer posting joined on its invoice id.
+- TaxTable from plugins.vat.VAT_TYPES.
+- One Transaction per beancount transaction, one Line per posting, with the
+  invoice id as SourceDocumentID.
+
+validate() checks a written file against the XSD from Erhvervsstyrelsen,
+offline, with lxml if it is installed (the lxml extra). The XSD is not
+shipped; fetch_schema() downloads it once to SCHEMA_PATH.
+"""
+
+import datetime
+import os
+from xml.sax.saxutils import XMLGenerator
+
+from beancount.core import convert
+from beancount.core import data
+
+from plugins import closing
+from plugins import debitorer
+from plugins.balance_index import BalanceIndex
+from plugins.danish_plugins import source_filename
+from plugins import invoice_pdf
+from plugins.money import from_ore, to_ore
+from plugins.vat import VAT_TYPES
+
+NAMESPACE = "urn:StandardAuditFile-Taxation-Financial:DK"
+AUDIT_FILE_VERSION = "1.0"
+SOFTWARE_ID = "beancount-dansk"
+SOFTWARE_VERSION = "0.1.0"
+CURRENCY = "DKK"
+SCHEMA_PATH = os.path.join("schemas", "SAF-T_Financial_DK.xsd")
+
+
+class SaftWriter:
+    """XMLGenerator with indentation and helpers for leaf elements."""
+
+    def __init__(self, f):
+        self.xml = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+        self.depth = 0
+
+    def start(self, name, attrs=None):
+        if self.depth:
+            self.xml.ignorableWhitespace("\n" + "  " * self.depth)
+        self.xml.startElement(name, attrs or {})
+        self.depth += 1
+
+    def end(self, name):
+        self.depth -= 1
+        self.xml.ignorableWhitespace("\n" + "  " * self.depth)
+        self.xml.endElement(name)
+
+    def element(self, name, text):
+        if text is None:
+            return
+        self.xml.ignorableWhitespace("\n" + "  " * self.depth)
+        self.xml.startElement(name, {})
+        self.xml.characters(str(text))
+        self.xml.endElement(name)
+
+
+def posting_ore(entry, posting):
+    """The posting's weight in øre of CURRENCY."""
+    weight = convert.get_weight(posting)
+    if weight.currency != CURRENCY:
+        raise ValueError(
+            f"{source_filename(entry)}:{entry.meta.get('lineno')}: "
+            f"SAF-T export needs {CURRENCY} amounts, got {weight.currency}"
+        )
+    return to_ore(weight.number)
+
+
+class Summary:
+    """
+    What the header and master files need. Account balances come from a
+    BalanceIndex of the posting weights, built here unless one is given, so
+    they match the posting_ore() amounts of the transaction lines.
+    """
+
+    def __init__(self, entries, options_map, start, end, balances=None):
+        balances = balances or BalanceIndex(entries, weights=True)
+        self.opens = []
+        self.count = self.debit = self.credit = 0
+        for entry in entries:
+            if type(entry) is data.Open:
+                self.opens.append(entry)
+                continue
+            if type(entry) is not data.Transaction or entry.date > end:
+                continue
+            in_period = entry.date >= start
+            if in_period:
+                self.count += 1
+            if not in_period:
+                continue
+            for posting in entry.postings:
+                ore = posting_ore(entry, posting)
+                if ore > 0:
+                    self.debit += ore
+                else:
+                    self.credit -= ore
+        # Customer balances per client, and the client of every invoice id
+        # for the CustomerID of the transaction lines.
+        items, _ = debitorer.build_index(entries, end)
+        self.clients = {}
+        self.customers = {}
+        for invoice_id, item in items.items():
+            if item.client is None:
+                continue
+            self.clients[invoice_id] = item.client
+            balance = self.customers.get(item.client, 0)
+            self.customers[item.client] = balance + item.invoiced - item.paid
+
+        day_before = start - datetime.timedelta(days=1)
+        year_before = datetime.date(start.year, 1, 1) - datetime.timedelta(days=1)
+        result_roots = tuple(
+            options_map[name] + ":" for name in ("name_income", "name_expenses")
+        )
+        earnings_account = closing.OPENING_ACCOUNT
+        earlier_result = 0
+        self.opening = {}
+        self.closing = {}
+        for entry in self.opens:
+            account = entry.account
+            opening_ore = to_ore(balances.balance(account, day_before))
+            closing_ore = to_ore(balances.balance(account, end))
+            if account.startswith(result_roots):
+                carried = to_ore(balances.balance(account, year_before))
+                earlier_result += carried
+                opening_ore -= carried
+                closing_ore -= carried
+            self.opening[account] = opening_ore
+            self.closing[account] = closing_ore
+        if earlier_result:
+            if earnings_account not in self.opening:
+                meta = data.new_metadata("<saft>", 0)
+                self.opens.append(
+                    data.Open(meta, year_before, earnings_account, None, None)
+                )
+            for balances_at in (self.opening, self.closing):
+                balances_at[earnings_account] = (
+                    balances_at.get(earnings_account, 0) + earlier_result
+                )
+
+
+def write_balance(writer, kind, ore):
+    if ore >= 0:
+        writer.element(f"{kind}DebitBalance", from_ore(ore))
+    else:
+        writer.element(f"{kind}CreditBalance", from_ore(-ore))
+
+
+def write_header(writer, options_map, start, end, today):
+    writer.start("Header")
+    writer.element("AuditFileVersion", AUDIT_FILE_VERSION)
+    writer.element("AuditFileCountry", "DK")
+    writer.element("AuditFileDateCreated", today.isoformat())
+    writer.element("SoftwareCompanyName", SOFTWARE_ID)
+    writer.element("SoftwareID", SOFTWARE_ID)
+    writer.element("SoftwareVersion", SOFTWARE_VERSION)
+    writer.start("Company")
+    writer.element("RegistrationNumber", invoice_pdf.COMPANY_CVR)
+    writer.element("Name", invoice_pdf.COMPANY_NAME)
+    writer.start("Address")
+    writer.element("Country", "DK")
+    writer.end("Address")
+    writer.end("Company")
+    writer.element("DefaultCurrencyCode", CURRENCY)
+    writer.start("SelectionCriteria")
+    writer.element("SelectionStartDate", start.isoformat())
+    writer.element("SelectionEndDate", end.isoformat())
+    writer.end("SelectionCriteria")
+    writer.element("HeaderComment", options_map.get("title"))
+    writer.element("TaxAccountingBasis", "A")
+    writer.end("Header")
+
+
+def write_master_files(writer, summary):
+    writer.start("MasterFiles")
+    writer.start("GeneralLedgerAccounts")
+    for entry in summary.opens:
+        account = entry.account
+        writer.start("Account")
+        writer.element("AccountID", account)
+        writer.element(
+            "AccountDescription",
+            entry.meta.get("description", account.rsplit(":", 1)[-1]),
+        )
+        writer.element("StandardAccountID", entry.meta.get("standard_account"))
+        writer.element("AccountType", "GL")
+        writer.element("AccountCreationDate", entry.date.isoformat())
+        write_balance(writer, "Opening", summary.opening.get(account, 0))
+        write_balance(writer, "Closing", summary.closing.get(account, 0))
+        writer.end("Account")
+    writer.end("GeneralLedgerAccounts")
+
+    if summary.customers:
+        writer.start("Customers")
+        for name, balance in sorted(summary.customers.items()):
+            writer.start("Customer")
+            writer.element("Name", name)
+            writer.start("Address")
+            writer.element("Country", "DK")
+            writer.end("Address")
+            writer.element("CustomerID", name)
+            writer.element("AccountID", debitorer.DEBITOR_ACCOUNT)
+            write_balance(writer, "Closing", balance)
+            writer.end("Customer")
+        writer.end("Customers")
+
+    writer.start("TaxTable")
+    writer.start("TaxTableEntry")
+    writer.element("TaxType", "MOMS")
+    writer.element("Description", "Merværdiafgift")
+    for name, vat_type in VAT_TYPES.items():
+        writer.start("TaxCodeDetails")
+        writer.element("TaxCode", name)
+        writer.element("Description", name)
+        writer.element("TaxPercentage", f"{vat_type.rate * 100:.2f}")
+        writer.element("Country", "DK")
+        writer.end("TaxCodeDetails")
+    writer.end("TaxTableEntry")
+    writer.end("TaxTable")
+    writer.end("MasterFiles")
+
+
+def write_transaction(writer, entry, transaction_id, clients):
+    invoice = entry.meta.get("invoice")
+    description = entry.narration or entry.payee or ""
+    writer.start("Transaction")
+    writer.element("TransactionID", transaction_id)
+    writer.element("Period", entry.date.month)
+    writer.element("PeriodYear", entry.date.year)
+    writer.element("TransactionDate", entry.date.isoformat())
+    writer.element("Description", description)
+    writer.element("SystemEntryDate", entry.date.isoformat())
+    writer.element("GLPostingDate", entry.date.isoformat())
+    for record_id, posting in enumerate(entry.postings, 1):
+        ore = posting_ore(entry, posting)
+        writer.start("Line")
+        writer.element("RecordID", f"{transaction_id}-{record_id}")
+        writer.element("AccountID", posting.account)
+        writer.element("SourceDocumentID", invoice)
+        if posting.account == debitorer.DEBITOR_ACCOUNT:
+            key = debitorer.invoice_key(entry, clients)
+            writer.element("CustomerID", clients.get(key))
+        writer.element("Description", description)
+        kind = "DebitAmount" if ore >= 0 else "CreditAmount"
+        writer.start(kind)
+        writer.element("Amount", from_ore(abs(ore)))
+        writer.end(kind)
+        writer.end("Line")
+    writer.end("Transaction")
+
+
+def write_saft(entries, options_map, f, start, end, today=None, balances=None):
+    """
+    Write the SAF-T audit file of the transactions dated start..end (both
+    included) to the text file f. Returns the number of transactions.
+    balances is an optional BalanceIndex(entries, weights=True). Raises
+    ValueError if a posting does not weigh in CURRENCY.
+    """
+    today = today or datetime.date.today()
+    summary = Summary(entries, options_map, start, end, balances)
+    writer = SaftWriter(f)
+    writer.xml.startDocument()
+    writer.start("AuditFile", {"xmlns": NAMESPACE})
+    write_header(writer, options_map, start, end, today)
+    write_master_files(writer, summary)
+
+    writer.start("GeneralLedgerEntries")
+    writer.element("NumberOfEntries", summary.count)
+    writer.element("TotalDebit", from_ore(summary.debit))
+    writer.element("TotalCredit", from_ore(summary.credit))
+    writer.start("Journal")
+    writer.element("JournalID", "GL")
+    writer.element("Description", "Finansjournal")
+    writer.element("Type", "GL")
+    transaction_id = 0
+    for entry in entries:
+        if type(entry) is not data.Transaction or not start <= entry.date <= end:
+            continue
+        transaction_id += 1
+        write_transaction(writer, entry, transaction_id, summary.clients)
+    writer.end("Journal")
+    writer.end("GeneralLedgerEntries")
+    writer.end("AuditFile")
+    writer.xml.endDocument()
+    f.write("\n")
+    return transaction_id
+
+
+def fetch_schema(url, schema_path=SCHEMA_PATH):
+    """Download the XSD at url to schema_path. Raises OSError on failure."""
+    import urllib.request
+
+    os.makedirs(os.path.dirname(schema_path) or ".", exist_ok=True)
+    tmp_path = f"{schema_path}.tmp"
+    with urllib.request.urlopen(url, timeout=30) as response:
+        with open(tmp_path, "wb") as f:
+            f.write(response.read())
+    os.replace(tmp_path, schema_path)
+
+
+def validate(path, schema_path=SCHEMA_PATH):
+    """
+    Validate the file at path against an XSD, streaming with lxml so memory
+    stays bounded. Returns a list of error messages; raises ImportError if
+    lxml is missing and OSError if the schema cannot be read.
+    """
+    from lxml import etree
+
+    schema = etree.XMLSchema(etree.parse(schema_path))
+    try:
+        for _, element in etree.iterparse(path, schema=schema):
+            if element.tag.endswith("}Transaction"):
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    except etree.XMLSyntaxError as exc:
+        return [str(exc)]
+    return []
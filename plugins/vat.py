@@ -0,0 +1,143 @@
+"""
+Danish VAT (moms) rules shared by quick_expense and auto_fill_expenses.
+
+VAT types and the filename rules that select them are plain data. A VatEngine
+compiles them once per load into split functions and caches the VAT type of
+every distinct source file, so the per-entry cost is a dict lookup whatever
+the number of rules. Amounts are split in integer øre (see plugins.money).
+"""
+
+import decimal
+from collections import namedtuple
+
+from plugins.money import div_round, from_ore, ratio, to_ore
+
+D = decimal.Decimal
+ZERO = D(0)
+
+VAT_BUY_ACCOUNT = "Assets:Moms:Koeb"
+VAT_SELL_ACCOUNT = "Liabilities:Moms:Salg"
+
+# rate: the VAT rate.
+# included: True if the booked amount includes VAT (Danish receipts), False if
+#   VAT is self-assessed on top of it (reverse charge, u-moms).
+# deductible: the share of the VAT that may be booked as købsmoms.
+VatType = namedtuple("VatType", "rate included deductible")
+
+VAT_TYPES = {
+    "standard": VatType(D("0.25"), True, D(1)),
+    "restaurant": VatType(D("0.25"), True, D("0.25")),
+    "u-moms": VatType(D("0.25"), False, D(1)),
+    "momsfri": VatType(ZERO, True, ZERO),
+}
+
+# Salgsmoms on sales invoices, recorded as VAT type SALES_VAT_TYPE.
+SALES_RATE = D("0.25")
+SALES_VAT_TYPE = "standard"
+_SALES_RATIO = ratio(SALES_RATE)
+
+# (filename substring, VAT type), first match wins.
+FILE_RULES = [
+    ("expenses_moms.beancount", "standard"),
+    ("expenses_momsfri.beancount", "momsfri"),
+    ("expenses_udland.beancount", "u-moms"),
+    ("expenses_repraesentation.beancount", "restaurant"),
+]
+
+
+def compile_vat_type(vat_type):
+    """
+    Return a function mapping a booked amount in øre to
+    (expense, købsmoms, salgsmoms) in øre. The three parts always add up to
+    the booked amount, so the credit posting balances exactly.
+    """
+    rate_num, rate_den = ratio(vat_type.rate)
+    ded_num, ded_den = ratio(vat_type.deductible)
+
+    if not rate_num:
+
+        def split(total):
+            return total, 0, 0
+
+    elif vat_type.included:
+        # VAT share of a VAT-inclusive amount: rate / (1 + rate).
+        num = rate_num * ded_num
+        den = (rate_den + rate_num) * ded_den
+
+        def split(total):
+            deductible_vat = div_round(total * num, den)
+            return total - deductible_vat, deductible_vat, 0
+
+    else:
+        num = rate_num * ded_num
+        den = rate_den * ded_den
+
+        def split(total):
+            vat = div_round(total * rate_num, rate_den)
+            deductible_vat = div_round(total * num, den)
+            return total + vat - deductible_vat, deductible_vat, -vat
+
+    return split
+
+
+def sales_vat(net):
+    """Salgsmoms in øre on a net sales amount in øre."""
+    return div_round(net * _SALES_RATIO[0], _SALES_RATIO[1])
+
+
+def decimal_splitter(split_ore):
+    """Wrap an øre split function to take and return Decimal amounts."""
+
+    def split(total):
+        expense, vat_buy, vat_sell = split_ore(to_ore(total))
+        return from_ore(expense), from_ore(vat_buy), from_ore(vat_sell)
+
+    return split
+
+
+class VatEngine:
+    """VAT rules compiled for one load."""
+
+    def __init__(self, vat_types=None, file_rules=None):
+        vat_types = VAT_TYPES if vat_types is None else vat_types
+        file_rules = FILE_RULES if file_rules is None else file_rules
+        self.ore_splitters = {
+            name: compile_vat_type(vat_type) for name, vat_type in vat_types.items()
+        }
+        self.splitters = {
+            name: decimal_splitter(split) for name, split in self.ore_splitters.items()
+        }
+        for _, name in file_rules:
+            if name not in self.splitters:
+                raise ValueError(f"File rule refers to unknown VAT type: {name}")
+        self.file_rules = tuple(file_rules)
+        self._by_file = {}
+
+    def type_for_file(self, filename):
+        """Return the VAT type name for a source file, or None."""
+        try:
+            return self._by_file[filename]
+        except KeyError:
+            pass
+        vat_type = None
+        for pattern, name in self.file_rules:
+            if pattern in filename:
+                vat_type = name
+                break
+        self._by_file[filename] = vat_type
+        return vat_type
+
+    def split_batch(self, vat_type, totals):
+        """
+        Split many Decimal amounts of one VAT type in a single call. Returns a
+        list of (expense, købsmoms, salgsmoms) Decimal tuples.
+        """
+        split = self.ore_splitters[vat_type]
+        return [
+            (from_ore(expense), from_ore(vat_buy), from_ore(vat_sell))
+            for expense, vat_buy, vat_sell in map(split, map(to_ore, totals))
+        ]
+
+    def split_ore_batch(self, vat_type, totals):
+        """Split many amounts given in øre, returning øre tuples."""
+        return list(map(self.ore_splitters[vat_type], totals))
@@ -0,0 +1,156 @@
+"""
+On-disk cache of plugin-processed entries for closed fiscal years.
+
+Closed years are taken out of the includes in regnskab.beancount and listed
+in this plugin's configuration instead:
+
+    plugin "plugins.danish_plugins"
+    plugin "plugins.year_cache" "2021 2022 2023 2024"
+    include "2025/*.beancount"
+
+For every listed year the plugin adds the entries of <year>/*.beancount after
+they have been booked and run through the Danish plugins. The result is kept
+in .ledger-cache/<year>.pickle next to the ledger, one record per file, keyed
+by the content hash of the file and of the trip-log CSV files it reads. Only
+files whose content or trip logs changed are parsed again, and a change to
+the plugin sources invalidates the whole cache. The year files and trip logs
+are added to options_map["include"], so Beancount's own pickle cache and
+Fava's file watcher notice when they are edited.
+
+Declare it after plugins.danish_plugins so the cached entries are not
+processed a second time. Booking runs per file, so a closed-year file cannot
+reduce lots opened in another file.
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+
+from beancount.parser import booking
+from beancount.parser import parser
+
+from plugins import danish_plugins
+
+CACHE_DIR = ".ledger-cache"
+PLUGIN_SOURCES = (
+    "builder.py",
+    "danish_plugins.py",
+    "danish_csv.py",
+    "invoice_pdf.py",
+    "mileage.py",
+    "money.py",
+    "vat.py",
+    "year_cache.py",
+)
+
+_plugin_version = None
+
+
+def plugin_version():
+    """Hash of the plugin sources that shape the cached entries."""
+    global _plugin_version
+    if _plugin_version is None:
+        digest = hashlib.sha256()
+        plugin_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in PLUGIN_SOURCES:
+            with open(os.path.join(plugin_dir, name), "rb") as f:
+                digest.update(f.read())
+        _plugin_version = digest.hexdigest()
+    return _plugin_version
+
+
+def parse_years(config):
+    return [year for year in config.replace(",", " ").split() if year]
+
+
+def file_digest(filename):
+    """sha256 hex digest of a file's content, or None if it is missing."""
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def process_file(filename, options_map):
+    """
+    Parse, book and run the Danish plugins on a single file. Returns
+    (entries, errors, trip logs), the last mapping each trip-log CSV the file
+    reads to its digest.
+    """
+    entries, errors, _ = parser.parse_file(filename)
+    trip_logs = {name: file_digest(name) for name in danish_plugins.trip_logs(entries)}
+    entries, booking_errors = booking.book(entries, options_map)
+    errors.extend(booking_errors)
+    # Closed years never queue invoice PDFs for rendering.
+    entries, plugin_errors = danish_plugins.run_pipeline(
+        entries, danish_plugins.InvoiceContext(pending=[])
+    )
+    errors.extend(plugin_errors)
+    return entries, errors, trip_logs
+
+
+def load_year(root, year, options_map):
+    """
+    Return (entries, errors, sources) for one year folder, re-processing only
+    files whose content changed since the cache was written. sources lists the
+    year's files and the trip-log CSVs they read.
+    """
+    cache_path = os.path.join(root, CACHE_DIR, f"{year}.pickle")
+    version = plugin_version()
+    cached = {}
+    try:
+        with open(cache_path, "rb") as f:
+            stored_version, stored_files = pickle.load(f)
+        if stored_version == version:
+            cached = stored_files
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+
+    files = {}
+    dirty = False
+    for filename in sorted(glob.glob(os.path.join(root, year, "*.beancount"))):
+        digest = file_digest(filename)
+        record = cached.get(filename)
+        if (
+            record is None
+            or record[0] != digest
+            or any(file_digest(name) != log for name, log in record[3].items())
+        ):
+            record = (digest, *process_file(filename, options_map))
+            dirty = True
+        files[filename] = record
+    if files.keys() != cached.keys():
+        dirty = True
+
+    if dirty:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((version, files), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    entries = []
+    errors = []
+    sources = list(files)
+    for _, file_entries, file_errors, trip_logs in files.values():
+        entries.extend(file_entries)
+        errors.extend(file_errors)
+        sources.extend(trip_logs)
+    return entries, errors, sources
+
+
+def year_cache(entries, options_map, config=""):
+    root = os.path.dirname(options_map["filename"])
+    new_entries = list(entries)
+    errors = []
+    for year in parse_years(config):
+        year_entries, year_errors, sources = load_year(root, year, options_map)
+        new_entries.extend(year_entries)
+        errors.extend(year_errors)
+        danish_plugins.add_includes(options_map, sources)
+    return new_entries, errors
+
+
+__plugins__ = [year_cache]
@@ -0,0 +1,75 @@
+import argparse
+import sys
+import os
+import time
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import instrumentation  # noqa: E402
+from plugins import invoice_pdf  # noqa: E402
+from plugins.invoice_registry import InvoiceRegistry  # noqa: E402
+
+
+def render_invoices(input_file, workers=None):
+    print(f"Loading {input_file}...")
+    # The render queue is filled by the plugins, so they must actually run
+    # instead of being served from beancount's pickle cache.
+    loader.initialize(use_cache=False)
+    entries, errors, options = loader.load_file(input_file)
+    if errors:
+        print(f"Found {len(errors)} errors during loading.")
+
+    # A reused invoice id would overwrite the PDF of the invoice that was
+    # issued first, so those are left for the user to renumber.
+    registry = InvoiceRegistry(entries)
+    jobs = []
+    for job in invoice_pdf.pending(options):
+        if registry.is_duplicated(job.invoice_id):
+            print(f"  SKIPPED {job.invoice_id}: invoice id is used more than once")
+        else:
+            jobs.append(job)
+    if not jobs:
+        print("No pending invoices.")
+        return 0
+
+    print(f"Rendering {len(jobs)} invoices...")
+    failed = 0
+    render_s = 0
+    t0 = time.perf_counter()
+    for job, error, job_render_s in invoice_pdf.render_all(jobs, workers):
+        render_s += job_render_s
+        if error is None:
+            print(f"  {job.filepath}")
+        else:
+            failed += 1
+            print(f"  FAILED {job.invoice_id}: {error}")
+    wall_s = time.perf_counter() - t0
+    print("Done.")
+
+    enabled, json_path = instrumentation.parse_setting(
+        os.environ.get(instrumentation.ENV_VAR)
+    )
+    if enabled:
+        # Add the render figures to the report of the load that queued them.
+        run = instrumentation.current or instrumentation.Run(input_file)
+        run.record(
+            "render_invoices",
+            wall_s=round(wall_s, 6),
+            entries_in=len(jobs),
+            entries_out=len(jobs) - failed,
+            transformed=len(jobs) - failed,
+            errors=failed,
+            render_s=round(render_s, 6),
+        )
+        run.emit(json_path)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render pending invoice PDFs.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args()
+    sys.exit(render_invoices(args.ledger, args.workers))
@@ -0,0 +1,84 @@
+import argparse
+import datetime
+import sys
+import os
+import time
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins import saft  # noqa: E402
+
+
+def saft_export(input_file, output_file, start, end, schema=None):
+    if schema is not None and not os.path.exists(schema):
+        print(f"Schema {schema} not found. Download the SAF-T Financial (DK) XSD")
+        print("from Erhvervsstyrelsen with --fetch-schema URL, or pass its path.")
+        return 1
+
+    print(f"Loading {input_file}...")
+    entries, errors, options = loader.load_file(input_file)
+    if errors:
+        print(f"Found {len(errors)} errors during loading.")
+
+    print(f"Writing SAF-T {start}..{end} to {output_file}...")
+    t0 = time.perf_counter()
+    tmp_path = f"{output_file}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            count = saft.write_saft(entries, options, f, start, end)
+    except ValueError as exc:
+        os.remove(tmp_path)
+        print(f"SAF-T export failed: {exc}")
+        return 1
+    os.replace(tmp_path, output_file)
+    print(f"  {count} transactions ({time.perf_counter() - t0:.2f}s)")
+
+    if schema is None:
+        return 0
+    try:
+        problems = saft.validate(output_file, schema)
+    except ImportError:
+        print("Validation needs lxml: uv sync --extra lxml")
+        return 1
+    except OSError as exc:
+        print(f"Cannot read schema {schema}: {exc}")
+        return 1
+    for problem in problems:
+        print(problem)
+    print("Schema validation failed." if problems else "Valid against schema.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export SAF-T Financial (DK).")
+    parser.add_argument("input", nargs="?", default="regnskab.beancount")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--year", type=int, default=datetime.date.today().year - 1)
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument(
+        "--validate",
+        nargs="?",
+        const=saft.SCHEMA_PATH,
+        metavar="XSD",
+        help=f"validate against the schema (default {saft.SCHEMA_PATH})",
+    )
+    parser.add_argument(
+        "--fetch-schema",
+        metavar="URL",
+        help=f"download the XSD from URL to {saft.SCHEMA_PATH} first",
+    )
+    args = parser.parse_args()
+    if args.fetch_schema:
+        try:
+            saft.fetch_schema(args.fetch_schema)
+        except OSError as exc:
+            print(f"Cannot fetch schema from {args.fetch_schema}: {exc}")
+            sys.exit(1)
+        print(f"Saved schema to {saft.SCHEMA_PATH}")
+    start = args.start or datetime.date(args.year, 1, 1)
+    end = args.end or datetime.date(args.year, 12, 31)
+    output = args.output or f"saft_{start.year}.xml"
+    sys.exit(saft_export(args.input, output, start, end, args.validate))
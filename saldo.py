@@ -0,0 +1,50 @@
+import argparse
+import datetime
+import sys
+import os
+from beancount import loader
+
+# Ensure local plugins can be found
+sys.path.insert(0, os.getcwd())
+
+from plugins.balance_index import BalanceIndex  # noqa: E402
+
+
+def report_balances(input_file, accounts, dates, currency="DKK"):
+    entries, errors, options = loader.load_file(input_file)
+    balances = BalanceIndex(entries)
+    dates = dates or [datetime.date.today()]
+    print(f"{'Konto':<40}" + "".join(f"{date.isoformat():>16}" for date in dates))
+    for account in accounts:
+        row = "".join(
+            f"{balances.total(account, date, currency):>16}" for date in dates
+        )
+        print(f"{account:<40}{row}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Account balances on given dates.")
+    parser.add_argument("ledger", nargs="?", default="regnskab.beancount")
+    parser.add_argument(
+        "-a",
+        "--account",
+        action="append",
+        dest="accounts",
+        help="account, sub-accounts included (default Assets:Bank)",
+    )
+    parser.add_argument(
+        "-d",
+        "--date",
+        action="append",
+        dest="dates",
+        type=datetime.date.fromisoformat,
+        help="YYYY-MM-DD, may be repeated (default today)",
+    )
+    parser.add_argument("--currency", default="DKK")
+    args = parser.parse_args()
+    sys.exit(
+        report_balances(
+            args.ledger, args.accounts or ["Assets:Bank"], args.dates, args.currency
+        )
+    )